@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+# Поля пользователя в кеше: все, кроме хеша пароля.
+CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname != 'password')
+
+
+def user_key(user_id):
+    return 'auth:user:%s' % user_id
+
+
+def dump_user(user):
+    """Запись кеша: поля пользователя без пароля и хеш сессии."""
+    data = {field: getattr(user, field) for field in CACHED_FIELDS}
+    data['session_hash'] = user.get_session_auth_hash()
+    return data
+
+
+def load_user(data):
+    """Пользователь из записи кеша с отложенным полем password.
+
+    Пароль читается из базы только при обращении к нему (смена пароля,
+    проверка старого). Пока он не загружен, хеш сессии берется из кеша:
+    смена пароля сбрасывает запись.
+    """
+    user = User.from_db(
+        router.db_for_read(User), CACHED_FIELDS,
+        [data[field] for field in CACHED_FIELDS])
+
+    def get_session_auth_hash():
+        if 'password' in user.__dict__:
+            return User.get_session_auth_hash(user)
+        return data['session_hash']
+
+    user.get_session_auth_hash = get_session_auth_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берет пользователя сессии из кеша.
+
+    AuthenticationMiddleware загружает пользователя на каждый запрос;
+    с этим бэкендом запрос к auth_user идет только при промахе кеша.
+    Хеш пароля в кеш не попадает, вместо него хранится хеш сессии.
+    Запись сбрасывается при сохранении и удалении пользователя, в том
+    числе при смене пароля. Между процессами сброс работает только
+    с общим кешем (CACHE_BACKEND), иначе устаревшая запись живет до
+    USER_CACHE_TIMEOUT. Сессии, созданные с ModelBackend, этим бэкендом
+    не обслуживаются и читают пользователя из базы до нового входа.
+    """
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, dump_user(user), settings.USER_CACHE_TIMEOUT)
+        else:
+            user = load_user(data)
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    cache.delete(user_key(instance.pk))
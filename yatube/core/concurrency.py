@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from contextvars import copy_context
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .instrumentation import current_metrics
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CONCURRENT_QUERIES_WORKERS,
+            thread_name_prefix='queries'
+        )
+    return _executor
+
+
+def _in_transaction():
+    return any(connections[alias].in_atomic_block for alias in connections)
+
+
+def _run(call):
+    """Выполняет call в потоке пула со своими соединениями.
+
+    Соединения потока живут между вызовами и закрываются по тем же
+    правилам CONN_MAX_AGE, что и соединения запросов. Запросы потока
+    учитываются в метриках исходного запроса.
+    """
+    close_old_connections()
+    metrics = current_metrics.get()
+    with ExitStack() as stack:
+        if metrics is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+        return call()
+
+
+def gather(*calls):
+    """Выполняет независимые запросы параллельно и возвращает результаты.
+
+    Первый вызов идет в текущем потоке, остальные — в пуле потоков
+    с копией контекста (реплика для чтения, метрики запроса).
+    Исключения вызовов пробрасываются. Внутри транзакции (в том числе
+    в тестах) и при выключенном CONCURRENT_QUERIES вызовы выполняются
+    по очереди: другие соединения не видят незафиксированных данных.
+    """
+    if (len(calls) < 2 or not settings.CONCURRENT_QUERIES
+            or _in_transaction()):
+        return [call() for call in calls]
+    executor = _get_executor()
+    futures = [
+        executor.submit(copy_context().run, _run, call) for call in calls[1:]
+    ]
+    try:
+        first = calls[0]()
+    except Exception:
+        wait(futures)
+        raise
+    return [first, *(future.result() for future in futures)]
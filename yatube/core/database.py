@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет к новому соединению SQLite настройки SQLITE_PRAGMAS.
+
+    WAL позволяет читать во время записи, synchronous=NORMAL в режиме
+    WAL безопасен и не ждет fsync на каждой транзакции, busy_timeout
+    заставляет писателей ждать блокировку вместо «database is locked».
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Перед запросом закрывает разорванные постоянные соединения.
+
+    Django 2.2 проверяет соединение только после ошибки, поэтому
+    разорванное сервером постоянное соединение (CONN_MAX_AGE) иначе
+    обнаружится лишь на первом запросе к базе.
+    """
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not connection.is_usable()):
+            connection.close()
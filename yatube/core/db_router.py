@@ -0,0 +1,120 @@
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.middleware import get_user
+from django.utils.functional import SimpleLazyObject
+
+PRIMARY = 'default'
+PIN_SESSION_KEY = '_db_primary_until'
+DATABASE_CACHE = 'django.core.cache.backends.db.DatabaseCache'
+
+# Реплика, выбранная для представления с @read_replica; одна на запрос,
+# чтобы все чтения видели данные с одинаковым отставанием.
+_replica_reads = ContextVar('replica_reads', default=None)
+# Модели, записанные за текущий запрос (см. ReplicaPinMiddleware).
+_request_writes = ContextVar('request_writes', default=None)
+
+
+def using_replica():
+    """Идут ли чтения текущего запроса на реплику."""
+    return _replica_reads.get() is not None
+
+
+def is_pinned(request):
+    """Сессия недавно писала в базу и читает только с основной."""
+    session = getattr(request, 'session', None)
+    return (session is not None
+            and session.get(PIN_SESSION_KEY, 0) > time.time())
+
+
+def pin_to_primary(request):
+    request.session[PIN_SESSION_KEY] = (
+        time.time() + settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_cache_table(model):
+    """Модель — таблица кеша DatabaseCache (CACHE_BACKEND=db)."""
+    return any(
+        options['BACKEND'] == DATABASE_CACHE
+        and options.get('LOCATION') == model._meta.db_table
+        for options in settings.CACHES.values())
+
+
+class PrimaryReplicaRouter:
+    """Запись всегда в основную базу, чтение в @read_replica — с реплик.
+
+    Таблица кеша читается только с основной базы: версии лент на
+    отстающей реплике вернули бы сброшенные страницы. Ее запись не
+    закрепляет сессию за основной базой — кеш заполняют и чтения.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_cache_table(model):
+            return PRIMARY
+        return _replica_reads.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if is_cache_table(model):
+            return PRIMARY
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def read_replica(view):
+    """Читает данные представления с реплики.
+
+    Реплика выбирается один раз на запрос. Пользователь и сессия
+    загружаются с основной базы до переключения.
+    Сессии, которые недавно писали, остаются на основной базе, чтобы
+    автор сразу увидел свой пост после редиректа.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned(request):
+            return view(request, *args, **kwargs)
+        if isinstance(getattr(request, 'user', None), SimpleLazyObject):
+            # AuthenticationMiddleware загружает пользователя лениво:
+            # без явной загрузки здесь он читался бы с реплики.
+            request.user = get_user(request)
+        replica = None
+        if settings.DATABASE_REPLICAS:
+            replica = random.choice(settings.DATABASE_REPLICAS)
+        token = _replica_reads.set(replica)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за основной базой сессию, которая записала данные.
+
+    Окно DATABASE_REPLICA_PIN_SECONDS должно перекрывать отставание
+    реплик. Закрепляются только вошедшие пользователи: у гостей нет
+    своих записей, а запись сессии на каждый гостевой запрос дорога.
+    Должен стоять после SessionMiddleware и AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+        user = getattr(request, 'user', None)
+        if writes and user is not None and user.is_authenticated:
+            pin_to_primary(request)
+        return response
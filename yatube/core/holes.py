@@ -0,0 +1,51 @@
+import base64
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.loader import render_to_string
+
+# Включено, пока представление рендерит общий каркас страницы.
+_skeleton = ContextVar('skeleton', default=False)
+
+MARKER = '<!--hole:%s-->'
+MARKER_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def rendering_skeleton():
+    return _skeleton.get()
+
+
+@contextmanager
+def skeleton(enabled=True):
+    """Рендерит {% hole %} метками вместо содержимого.
+
+    Такой каркас не зависит от пользователя и кешируется целиком,
+    а метки заполняются на каждый запрос в fill_holes.
+    """
+    token = _skeleton.set(enabled)
+    try:
+        yield
+    finally:
+        _skeleton.reset(token)
+
+
+def hole_marker(template_name, values):
+    """Метка дырки: имя шаблона и его простые параметры.
+
+    Пользовательский текст в шаблонах экранируется, поэтому подделать
+    метку через содержимое постов нельзя.
+    """
+    data = json.dumps([template_name, values], separators=(',', ':'))
+    return MARKER % base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def fill_holes(request, content):
+    """Рендерит дырки каркаса для текущего пользователя."""
+    def render(match):
+        template_name, values = json.loads(
+            base64.urlsafe_b64decode(match.group(1)))
+        return render_to_string(template_name, values, request=request)
+
+    return MARKER_RE.sub(render, content.decode()).encode()
@@ -0,0 +1,166 @@
+import re
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+from django.template.exceptions import TemplateDoesNotExist
+
+# Метрики текущего запроса; None вне запроса (команды, фоновые потоки).
+current_metrics = ContextVar('request_metrics', default=None)
+
+PLACEHOLDERS_RE = re.compile(r'\((?:%s, )+%s\)')
+FLAGGED_LIMIT = 20
+
+
+def normalize_sql(sql):
+    """Шаблон запроса: списки IN разной длины сводятся к одному виду."""
+    return PLACEHOLDERS_RE.sub('(%s, ...)', sql)
+
+
+class RequestMetrics:
+    """Запросы к БД и время этапов одного HTTP-запроса."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.view_name = None
+        self.view_started = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_time = 0.0
+        self.total_time = 0.0
+        self.statements = Counter()
+        # Запросы могут идти из пула потоков (core.concurrency.gather).
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка execute_wrapper: считает запросы и их время."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            with self._lock:
+                self.db_time += duration
+                self.queries += 1
+                self.statements[normalize_sql(sql)] += 1
+
+    def repeated_statements(self, threshold):
+        """Запросы, повторенные не меньше threshold раз, — признак N+1."""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self):
+        return ', '.join((
+            'db;dur=%.1f;desc="%s queries"' % (
+                self.db_time * 1000, self.queries),
+            'tpl;dur=%.1f' % (self.template_time * 1000),
+            'view;dur=%.1f' % (self.view_time * 1000),
+            'total;dur=%.1f' % (self.total_time * 1000),
+        ))
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, измеряющий время загрузки и рендеринга
+    шаблонов в запросе.
+
+    Вложенные шаблоны ({% include %}, {% extends %}) загружаются
+    и рендерятся внутри движка и не учитываются повторно.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        # Загрузка и разбор шаблона тоже входят во время шаблонов.
+        metrics = current_metrics.get()
+        start = perf_counter()
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+        finally:
+            if metrics is not None:
+                metrics.template_time += perf_counter() - start
+
+
+class ViewStats:
+    """Накопленная статистика по одному представлению."""
+
+    FIELDS = ('queries', 'db_time', 'template_time', 'view_time',
+              'total_time')
+
+    def __init__(self):
+        self.requests = 0
+        self.n_plus_one = 0
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+        self.maximums = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, metrics, flagged):
+        self.requests += 1
+        self.n_plus_one += bool(flagged)
+        for field in self.FIELDS:
+            value = getattr(metrics, field)
+            self.totals[field] += value
+            self.maximums[field] = max(self.maximums[field], value)
+
+    def as_dict(self):
+        data = {'requests': self.requests, 'n_plus_one': self.n_plus_one}
+        for field in self.FIELDS:
+            scale = 1 if field == 'queries' else 1000
+            data['avg_' + field] = round(
+                self.totals[field] * scale / self.requests, 2)
+            data['max_' + field] = round(self.maximums[field] * scale, 2)
+        return data
+
+
+class StatsRegistry:
+    """Статистика процесса по представлениям; потокобезопасна."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+            self._flagged = []
+
+    def record(self, metrics, flagged):
+        with self._lock:
+            stats = self._views.setdefault(metrics.view_name, ViewStats())
+            stats.add(metrics, flagged)
+            for sql, count in flagged:
+                self._flagged.append(
+                    {'view': metrics.view_name, 'sql': sql, 'count': count})
+            del self._flagged[:-FLAGGED_LIMIT]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'views': {
+                    name: stats.as_dict()
+                    for name, stats in sorted(self._views.items())
+                },
+                'n_plus_one': list(self._flagged),
+            }
+
+
+stats = StatsRegistry()
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .tasks import task
+
+MESSAGE_FIELDS = ('subject', 'body', 'from_email', 'to', 'cc', 'bcc',
+                  'reply_to', 'extra_headers')
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Отправляет письма задачами очереди через QUEUED_EMAIL_BACKEND.
+
+    Письма с вложениями отправляются сразу: вложения не сериализуются.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.attachments:
+                get_connection(
+                    settings.QUEUED_EMAIL_BACKEND,
+                    fail_silently=self.fail_silently,
+                ).send_messages([message])
+                continue
+            data = {field: getattr(message, field) for field in MESSAGE_FIELDS}
+            data['alternatives'] = getattr(message, 'alternatives', [])
+            send_email.delay(data)
+        return len(email_messages)
+
+
+@task
+def send_email(data):
+    """Отправляет письмо, поставленное в очередь QueuedEmailBackend."""
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['extra_headers'],
+        alternatives=[tuple(item) for item in data['alternatives']],
+        connection=get_connection(settings.QUEUED_EMAIL_BACKEND),
+    )
+    message.send()
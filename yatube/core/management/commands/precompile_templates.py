@@ -0,0 +1,28 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.template_cache import precompile_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует все шаблоны из каталога templates/ и прогревает '
+        'cached loader; при синтаксических ошибках завершается с ошибкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Также шаблоны приложений (админка и т. п.).')
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        compiled, errors = precompile_templates(not options['all'])
+        for error in errors:
+            self.stderr.write(error)
+        if errors:
+            raise CommandError('Ошибок в шаблонах: %s.' % len(errors))
+        self.stdout.write(self.style.SUCCESS(
+            'Скомпилировано шаблонов: %s за %.2f с.' % (
+                compiled, perf_counter() - start)))
@@ -0,0 +1,90 @@
+import logging
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.tasks import claim, execute
+
+logger = logging.getLogger(__name__)
+
+
+def _execute(task):
+    close_old_connections()
+    try:
+        return execute(task)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из очереди core.tasks в пуле потоков. '
+        'SIGINT/SIGTERM дожидаются выполняющихся задач.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASK_WORKERS,
+            help='Число потоков (по умолчанию TASK_WORKERS).')
+        parser.add_argument(
+            '--poll', type=float, default=settings.TASK_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунд.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+        executor = ThreadPoolExecutor(
+            max_workers=options['workers'], thread_name_prefix='tasks')
+        self.results = Counter()
+        self.lock = threading.Lock()
+        try:
+            self.run(executor, stop, options)
+        finally:
+            executor.shutdown(wait=True)
+            close_old_connections()
+        self.stdout.write(self.style.SUCCESS(
+            'Выполнено задач: %s, с ошибкой: %s.' % (
+                self.results[True], self.results[False])))
+
+    def count(self, future):
+        try:
+            result = future.result()
+        except Exception:
+            # Не удалось записать итог задачи: она остается занятой
+            # и после конца аренды выполнится снова.
+            logger.exception('Ошибка учета задачи')
+            result = False
+        with self.lock:
+            self.results[result] += 1
+
+    def run(self, executor, stop, options):
+        """Забирает задачи, пока в пуле есть свободные потоки."""
+        running = set()
+        while not stop.is_set():
+            running = {future for future in running if not future.done()}
+            close_old_connections()
+            free = options['workers'] - len(running)
+            tasks = claim(free) if free > 0 else []
+            for task in tasks:
+                future = executor.submit(_execute, task)
+                future.add_done_callback(self.count)
+                running.add(future)
+            if tasks:
+                continue
+            if running:
+                wait(running, timeout=options['poll'],
+                     return_when=FIRST_COMPLETED)
+            elif options['once']:
+                return
+            else:
+                stop.wait(options['poll'])
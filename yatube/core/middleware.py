@@ -0,0 +1,59 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import RequestMetrics, current_metrics, stats
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class RequestStatsMiddleware:
+    """Считает запросы к БД и время этапов каждого запроса.
+
+    Итоги пишутся в заголовок Server-Timing и в статистику процесса
+    по имени представления (posts:index, posts:profile, ...). Время
+    представления отсчитывается от process_view и включает ответную
+    часть middleware ниже по списку.
+    Повторяющиеся запросы отмечаются как N+1. Должен стоять первым
+    в MIDDLEWARE, чтобы учесть запросы остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        finished = perf_counter()
+        metrics.total_time = finished - metrics.started
+        if metrics.view_started is not None:
+            metrics.view_time = finished - metrics.view_started
+        if metrics.view_name is None:
+            metrics.view_name = UNRESOLVED_VIEW
+        flagged = metrics.repeated_statements(
+            settings.REQUEST_STATS_N_PLUS_ONE_THRESHOLD)
+        for sql, count in flagged:
+            logger.warning(
+                'Возможный N+1 в %s: %s запросов %s',
+                metrics.view_name, count, sql)
+        stats.record(metrics, flagged)
+        if settings.REQUEST_STATS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        metrics.view_name = request.resolver_match.view_name
+        metrics.view_started = perf_counter()
@@ -0,0 +1,185 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+WRITES_KEY = 'ratelimit:writes'
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): число действий и период в секундах."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def _bucket(key, rate):
+    """Ключ корзины в кеше и интервал пополнения одним токеном, мс."""
+    count, period = parse_rate(rate)
+    return 'ratelimit:%s' % key, period * 1000 // count
+
+
+def wait_time(key, rate):
+    """Секунды до токена в корзине key; корзина не меняется."""
+    count, _ = parse_rate(rate)
+    key, interval = _bucket(key, rate)
+    full_at = cache.get(key)
+    if full_at is None:
+        return 0
+    # Столько миллисекунд взятие токена превысило бы емкость корзины.
+    excess = full_at + interval - int(time.time() * 1000) - interval * count
+    return max(0, math.ceil(excess / 1000))
+
+
+def take_token(key, rate):
+    """Берет токен из корзины key; возвращает 0 или секунды до токена.
+
+    Корзина вмещает count токенов и пополняется count токенами
+    за период. Хранится одно число — время в миллисекундах, когда
+    корзина снова станет полной (GCRA); токен берется атомарным
+    cache.incr, поэтому одновременные запросы из разных процессов
+    не проходят сверх лимита.
+    """
+    count, period = parse_rate(rate)
+    key, interval = _bucket(key, rate)
+    burst = interval * count
+    now = int(time.time() * 1000)
+    if cache.add(key, now + interval, period):
+        return 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # Запись истекла между add и incr.
+        cache.set(key, now + interval, period)
+        return 0
+    if full_at <= now + interval:
+        # Корзина была полной: отсчет идет от текущего момента.
+        cache.set(key, now + interval, period)
+        return 0
+    if full_at - now > burst:
+        cache.decr(key, interval)
+        return math.ceil((full_at - now - burst) / 1000)
+    cache.touch(key, period)
+    return 0
+
+
+def return_token(key, rate):
+    """Возвращает в корзину key взятый из нее токен."""
+    key, interval = _bucket(key, rate)
+    try:
+        cache.decr(key, interval)
+    except ValueError:
+        pass
+
+
+def client_ip(request):
+    """IP-адрес клиента из заголовка RATE_LIMIT_IP_HEADER.
+
+    За прокси адрес клиента берется из последнего элемента
+    X-Forwarded-For: его дописывает сам прокси, а начало списка
+    присылает клиент. Без заголовка — REMOTE_ADDR.
+    """
+    value = request.META.get(settings.RATE_LIMIT_IP_HEADER)
+    if not value:
+        return request.META.get('REMOTE_ADDR')
+    return value.split(',')[-1].strip()
+
+
+def rate_limited(request, scope):
+    """Секунды до следующей попытки или 0, если лимит не превышен.
+
+    Лимит из RATE_LIMITS[scope] действует отдельно для пользователя
+    и для IP-адреса. Токен берется из обеих корзин, только если
+    обе его дают: отказ по одной не тратит токен другой.
+    """
+    rate = settings.RATE_LIMITS[scope]
+    keys = ['%s:ip:%s' % (scope, client_ip(request))]
+    if request.user.is_authenticated:
+        keys.append('%s:user:%s' % (scope, request.user.pk))
+    retry_after = max(wait_time(key, rate) for key in keys)
+    if retry_after:
+        return retry_after
+    taken = []
+    for key in keys:
+        retry_after = take_token(key, rate)
+        if retry_after:
+            # Корзину опустошил параллельный запрос.
+            for taken_key in taken:
+                return_token(taken_key, rate)
+            return retry_after
+        taken.append(key)
+    return 0
+
+
+def _refuse(request, template, status, retry_after):
+    response = render(request, template, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Ограничивает частоту запросов methods к представлению.
+
+    При превышении лимита отвечает 429 с Retry-After. Запросы считаются
+    выполняющимися записями для overloaded().
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.RATE_LIMIT_ENABLED
+                    or request.method not in methods):
+                return view(request, *args, **kwargs)
+            retry_after = rate_limited(request, scope)
+            if retry_after:
+                return _refuse(request, 'core/429.html', 429, retry_after)
+            _count_write(1)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _count_write(-1)
+        return wrapper
+    return decorator
+
+
+def _count_write(delta):
+    """Меняет счетчик выполняющихся записей и продлевает его жизнь.
+
+    Каждое изменение продлевает OVERLOAD_WINDOW, поэтому при постоянном
+    потоке записей счетчик не истекает между incr и decr одной записи.
+    Если он все же истек, decr не уводит его ниже нуля.
+    """
+    cache.add(WRITES_KEY, 0, settings.OVERLOAD_WINDOW)
+    try:
+        value = cache.incr(WRITES_KEY, delta)
+    except ValueError:
+        return
+    if value < 0:
+        cache.set(WRITES_KEY, 0, settings.OVERLOAD_WINDOW)
+    else:
+        cache.touch(WRITES_KEY, settings.OVERLOAD_WINDOW)
+
+
+def overloaded():
+    """Выполняется ли во всех процессах больше OVERLOAD_MAX_WRITES записей.
+
+    Счетчик живет OVERLOAD_WINDOW секунд после последнего изменения,
+    чтобы записи упавших процессов не копились в нем.
+    """
+    return cache.get(WRITES_KEY, 0) >= settings.OVERLOAD_MAX_WRITES
+
+
+def shed_load(view):
+    """Второстепенное чтение: при перегрузке записью отвечает 503.
+
+    Записи не сбрасываются: их уже ограничивает rate_limit.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if settings.RATE_LIMIT_ENABLED and overloaded():
+            return _refuse(request, 'core/503.html', 503,
+                           settings.OVERLOAD_RETRY_AFTER)
+        return view(request, *args, **kwargs)
+    return wrapper
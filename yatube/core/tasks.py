@@ -0,0 +1,124 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+from importlib import import_module
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(func=None, *, max_attempts=None):
+    """Регистрирует функцию как задачу очереди.
+
+    Функция по-прежнему вызывается напрямую, а func.delay(*args,
+    **kwargs) ставит вызов в очередь. Аргументы должны сериализоваться
+    в JSON. Задача может выполниться повторно (ошибка, истекшая аренда
+    упавшего воркера), поэтому она должна быть идемпотентной.
+    """
+    def decorator(func):
+        name = '%s.%s' % (func.__module__, func.__qualname__)
+        _registry[name] = func
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.delay = partial(enqueue, func)
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name):
+    """Функция задачи по имени; модуль задачи импортируется при нужде."""
+    if name not in _registry:
+        import_module(name.rpartition('.')[0])
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError('Неизвестная задача %s' % name)
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит вызов задачи в очередь.
+
+    Запись создается в текущей транзакции: воркер увидит задачу только
+    после ее фиксации, а при откате задача пропадет вместе с данными.
+    С TASKS_EAGER задача выполняется сразу, в том же запросе.
+    """
+    payload = json.dumps({'args': args, 'kwargs': kwargs})
+    if settings.TASKS_EAGER:
+        payload = json.loads(payload)
+        func(*payload['args'], **payload['kwargs'])
+        return None
+    return Task.objects.create(
+        name=func.task_name,
+        payload=payload,
+        max_attempts=func.max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная пауза перед следующей попыткой."""
+    return min(settings.TASK_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.TASK_RETRY_MAX_DELAY)
+
+
+def claim(limit):
+    """Забирает до limit задач, готовых к запуску, и возвращает их.
+
+    Задача захватывается условным UPDATE: из нескольких воркеров его
+    выполнит только один, без блокировок строк, поэтому очередь работает
+    и на SQLite. Воркер арендует задачу на TASK_LEASE_SECONDS; задачи
+    упавших воркеров после конца аренды забираются снова.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    ).values_list('pk', 'status', 'locked_until')[:limit]
+    lease = now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    claimed = []
+    for pk, status, locked_until in candidates:
+        if Task.objects.filter(
+                pk=pk, status=status, locked_until=locked_until).update(
+                    status=Task.RUNNING, locked_until=lease,
+                    attempts=F('attempts') + 1):
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def execute(task):
+    """Выполняет захваченную задачу.
+
+    Выполненная задача удаляется. После ошибки задача возвращается
+    в очередь с паузой retry_delay, а после max_attempts попыток
+    остается со статусом failed и текстом последней ошибки.
+    """
+    try:
+        if task.attempts > task.max_attempts:
+            raise RuntimeError('Аренда истекла на последней попытке')
+        func = get_task(task.name)
+        payload = json.loads(task.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s не выполнена (попытка %s из %s)',
+                         task, task.attempts, task.max_attempts)
+        changes = {'locked_until': None, 'last_error': traceback.format_exc()}
+        if task.attempts >= task.max_attempts:
+            changes['status'] = Task.FAILED
+        else:
+            changes['status'] = Task.QUEUED
+            changes['run_at'] = timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts))
+        Task.objects.filter(pk=task.pk).update(**changes)
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
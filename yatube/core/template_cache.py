@@ -0,0 +1,57 @@
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+def _loaders(engine):
+    for loader in engine.template_loaders:
+        if isinstance(loader, CachedLoader):
+            yield from loader.loaders
+        else:
+            yield loader
+
+
+def template_names(engine, project_only=True):
+    """Имена всех шаблонов, которые находят загрузчики движка.
+
+    С project_only — только из каталогов TEMPLATES['DIRS'], без шаблонов
+    приложений (админки и т. п.).
+    """
+    directories = engine.dirs if project_only else [
+        directory for loader in _loaders(engine)
+        for directory in loader.get_dirs()
+    ]
+    names = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                if not file_name.startswith('.'):
+                    names.add(os.path.relpath(
+                        os.path.join(root, file_name), directory
+                    ).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def precompile_templates(project_only=True):
+    """Компилирует шаблоны всех движков Django заранее.
+
+    С cached loader скомпилированные шаблоны остаются в памяти процесса,
+    и первые запросы после старта не разбирают шаблоны. Без него вызов
+    только проверяет синтаксис. Возвращает число шаблонов и список
+    ошибок «имя: сообщение».
+    """
+    compiled = 0
+    errors = []
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for name in template_names(engine, project_only):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as error:
+                errors.append('%s: %s' % (name, error))
+            else:
+                compiled += 1
+    return compiled, errors
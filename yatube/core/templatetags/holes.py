@@ -0,0 +1,45 @@
+from django import template
+from django.template.base import token_kwargs
+
+from core.holes import hole_marker, rendering_skeleton
+
+register = template.Library()
+
+
+class HoleNode(template.Node):
+    def __init__(self, template_name, extra_context):
+        self.template_name = template_name
+        self.extra_context = extra_context
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        values = {
+            name: value.resolve(context)
+            for name, value in self.extra_context.items()
+        }
+        if rendering_skeleton():
+            return hole_marker(template_name, values)
+        included = context.template.engine.get_template(template_name)
+        with context.push(**values):
+            return included.render(context)
+
+
+@register.tag
+def hole(parser, token):
+    """{% hole 'шаблон.html' имя=значение %} — зависящая от пользователя
+    часть страницы.
+
+    Обычно работает как {% include %}. В каркасе страницы
+    (core.holes.skeleton) выводит метку, которую core.holes.fill_holes
+    заменяет шаблоном, отрендеренным для текущего запроса. Значения
+    параметров должны сериализоваться в JSON (числа, строки).
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            '%r требует имя шаблона.' % bits[0])
+    extra_context = token_kwargs(bits[2:], parser)
+    if len(bits) > 2 and not extra_context:
+        raise template.TemplateSyntaxError(
+            'Параметры %r задаются как имя=значение.' % bits[0])
+    return HoleNode(parser.compile_filter(bits[1]), extra_context)
@@ -0,0 +1,812 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.template import Context, Template, engines
+from django.core import mail
+from django.core.signals import request_finished
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.utils import timezone
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from yatube.asgi import ThreadedWsgiToAsgi, application, build_environ
+
+from .concurrency import gather
+from .db_router import PIN_SESSION_KEY, read_replica
+from .holes import fill_holes, skeleton
+from .auth import user_key
+from .instrumentation import RequestMetrics, current_metrics, stats
+from .middleware import RequestStatsMiddleware
+from .models import Task
+from .ratelimit import WRITES_KEY, _count_write, take_token
+from .tasks import claim, execute, task
+
+User = get_user_model()
+
+REPLICA = 'replica'
+CONCURRENT = 'concurrent'
+TASKS = 'tasks'
+
+# Вызовы тестовых задач очереди.
+task_calls = []
+
+
+class TasksRouter:
+    """Все запросы — в файл SQLite TASKS, где работает busy_timeout."""
+
+    def db_for_read(self, model, **hints):
+        return TASKS
+
+    db_for_write = db_for_read
+
+
+@task
+def record(value):
+    task_calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise ValueError('Ошибка задачи')
+
+
+def attach_sqlite(alias):
+    """Подключает отдельный файл SQLite под alias и создает в нем схему."""
+    directory = tempfile.mkdtemp()
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(directory, alias + '.sqlite3'),
+    }
+    call_command('migrate', database=alias, verbosity=0)
+    return directory
+
+
+def detach_sqlite(alias, directory):
+    connections[alias].close()
+    del connections.databases[alias]
+    delattr(connections._connections, alias)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class RequestStatsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит время БД, шаблонов, представления и общее."""
+        response = self.guest_client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'queries', 'tpl;dur=', 'view;dur=',
+                       'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_stats_grouped_by_view_name(self):
+        """Статистика копится по имени представления."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('about:author'))
+        views = stats.snapshot()['views']
+        self.assertEqual(views['posts:index']['requests'], 2)
+        self.assertGreater(views['posts:index']['avg_queries'], 0)
+        self.assertGreater(views['posts:index']['avg_template_time'], 0)
+        self.assertEqual(views['about:author']['requests'], 1)
+
+    def test_repeated_queries_flagged_as_n_plus_one(self):
+        """Один и тот же запрос много раз подряд отмечается как N+1."""
+        def view(request):
+            User.objects.count()
+            for _ in range(5):
+                User.objects.filter(pk=self.user.pk).exists()
+            return HttpResponse()
+
+        RequestStatsMiddleware(view)(RequestFactory().get('/'))
+        flagged = stats.snapshot()['n_plus_one']
+        self.assertEqual(len(flagged), 1)
+        self.assertEqual(flagged[0]['count'], 5)
+
+    def test_stats_endpoint_for_staff_only(self):
+        """Статистику видит только персонал."""
+        url = reverse('request_stats')
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(url).status_code, HTTPStatus.FOUND)
+        client.force_login(self.staff)
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('views', response.json())
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TestCase):
+    """Маршрутизация между основной базой и репликой в отдельном файле.
+
+    Реплика не получает изменений основной базы, поэтому по содержимому
+    страниц видно, откуда читало представление.
+    """
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = attach_sqlite(REPLICA)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        detach_sqlite(REPLICA, cls.replica_dir)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        User.objects.db_manager(REPLICA).create_user(
+            pk=cls.author.pk, username='author')
+        cls.post = Post.objects.create(
+            text='Пост на основной', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_feeds_read_from_replica(self):
+        """Гость читает ленты с реплики."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_author_reads_own_writes(self):
+        """После записи автор читает с основной базы и видит свой пост."""
+        response = self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}, follow=True)
+        self.assertContains(response, 'Новый пост')
+        self.assertTrue(Post.objects.using('default').filter(
+            text='Новый пост').exists())
+        self.assertFalse(Post.objects.using(REPLICA).exists())
+        self.assertIn(PIN_SESSION_KEY, self.author_client.session)
+
+    def test_pin_expires(self):
+        """По истечении окна автор снова читает с реплики."""
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=-1):
+            self.author_client.post(
+                reverse('posts:post_create'), {'text': 'Новый пост'})
+        response = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA, 'other'])
+    def test_one_replica_per_request(self):
+        """Все чтения запроса идут на одну реплику."""
+        @read_replica
+        def view(request):
+            return {router.db_for_read(model) for model in (Post, Comment)
+                    for _ in range(20)}
+
+        for _ in range(5):
+            self.assertEqual(len(view(RequestFactory().get('/'))), 1)
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'test_cache',
+    }})
+    def test_database_cache_on_primary(self):
+        """Кеш в базе читается с основной и не закрепляет сессию."""
+        call_command('createcachetable', verbosity=0)
+        cache.set('version', 2)
+        self.assertTrue(cache.add('other', 1))
+
+        @read_replica
+        def view(request):
+            return router.db_for_read(cache.cache_model_class), cache.get(
+                'version')
+
+        self.assertEqual(view(RequestFactory().get('/')), ('default', 2))
+        response = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertNotIn(PIN_SESSION_KEY, self.author_client.session)
+
+    def test_guest_session_not_pinned(self):
+        """Чтение гостя не закрепляет и не создает сессию."""
+        self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn(PIN_SESSION_KEY, self.guest_client.session)
+
+    def test_reads_outside_replica_views_use_primary(self):
+        """Вне @read_replica чтения идут в основную базу."""
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    """Смешанные чтения и записи из многих потоков в файл SQLite."""
+
+    databases = {CONCURRENT}
+    threads = 8
+    operations = 40
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = attach_sqlite(CONCURRENT)
+        super().setUpClass()
+        # bulk_create не вызывает сигналы, которые пишут в основную базу.
+        User.objects.db_manager(CONCURRENT).bulk_create(
+            [User(username='writer')])
+        cls.author = User.objects.using(CONCURRENT).get()
+        Post.objects.db_manager(CONCURRENT).bulk_create(
+            [Post(text='Пост', author=cls.author)])
+        cls.post = Post.objects.using(CONCURRENT).get()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        detach_sqlite(CONCURRENT, cls.directory)
+
+    def test_connection_pragmas(self):
+        """Новое соединение SQLite получает настройки SQLITE_PRAGMAS."""
+        with connections[CONCURRENT].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0],
+                settings.SQLITE_PRAGMAS['busy_timeout'])
+
+    def worker(self, number):
+        writes = 0
+        try:
+            for step in range(self.operations):
+                if (number + step) % 4 == 0:
+                    with transaction.atomic(using=CONCURRENT):
+                        Comment.objects.db_manager(CONCURRENT).bulk_create([
+                            Comment(text='Комментарий', author=self.author,
+                                    post=self.post)])
+                        Post.objects.using(CONCURRENT).filter(
+                            pk=self.post.pk).update(
+                                comments_count=F('comments_count') + 1)
+                    writes += 1
+                else:
+                    list(Comment.objects.using(CONCURRENT).filter(
+                        post=self.post)[:10])
+                    Post.objects.using(CONCURRENT).filter(
+                        author=self.author).count()
+            return writes
+        finally:
+            connections[CONCURRENT].close()
+
+    def test_mixed_reads_and_writes(self):
+        """Потоки не получают «database is locked», записи не теряются."""
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            writes = sum(executor.map(self.worker, range(self.threads)))
+        self.assertEqual(
+            Comment.objects.using(CONCURRENT).count(), writes)
+        self.assertEqual(
+            Post.objects.using(CONCURRENT).get().comments_count, writes)
+
+
+class GatherTests(SimpleTestCase):
+    """Параллельное выполнение независимых запросов представления."""
+
+    @override_settings(CONCURRENT_QUERIES=True)
+    def test_calls_run_in_pool_and_keep_order(self):
+        """Вызовы после первого идут в пуле потоков, порядок сохраняется."""
+        results = gather(
+            threading.get_ident, threading.get_ident, lambda: 'третий')
+        self.assertEqual(results[0], threading.get_ident())
+        self.assertNotEqual(results[1], threading.get_ident())
+        self.assertEqual(results[2], 'третий')
+
+    @override_settings(CONCURRENT_QUERIES=True)
+    def test_context_and_errors_propagate(self):
+        """Потоки видят контекст запроса, исключения пробрасываются."""
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            self.assertEqual(
+                gather(current_metrics.get, current_metrics.get),
+                [metrics, metrics])
+        finally:
+            current_metrics.reset(token)
+
+        def fail():
+            raise Http404
+
+        with self.assertRaises(Http404):
+            gather(lambda: None, fail)
+
+    @override_settings(CONCURRENT_QUERIES=False)
+    def test_disabled_runs_sequentially(self):
+        self.assertEqual(
+            gather(threading.get_ident, threading.get_ident),
+            [threading.get_ident()] * 2)
+
+
+class AsgiApplicationTests(SimpleTestCase):
+    def test_asgi_serves_requests_concurrently(self):
+        """ASGI-приложение отвечает на одновременные запросы."""
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET',
+            'path': reverse('about:author'), 'root_path': '',
+            'query_string': b'', 'headers': [(b'host', b'testserver')],
+        }
+
+        async def request():
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+            return messages[0]['status']
+
+        async def load():
+            return await asyncio.gather(*(request() for _ in range(4)))
+
+        self.assertEqual(asyncio.run(load()), [HTTPStatus.OK] * 4)
+
+    def test_asgi_sends_body_and_finishes_request(self):
+        """Тело ответа доходит до клиента, а Django получает
+        request_finished.
+        """
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET',
+            'path': reverse('about:author'), 'root_path': '',
+            'query_string': b'', 'headers': [(b'host', b'testserver')],
+        }
+        messages = []
+        finished = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        def on_finished(**kwargs):
+            finished.append(True)
+
+        request_finished.connect(on_finished)
+        try:
+            asyncio.run(application(scope, receive, send))
+        finally:
+            request_finished.disconnect(on_finished)
+        self.assertEqual(messages[0]['status'], HTTPStatus.OK)
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        self.assertIn(b'<html', body)
+        self.assertFalse(messages[-1]['more_body'])
+        self.assertEqual(finished, [True])
+
+    def test_request_body_and_environ(self):
+        """Тело из нескольких сообщений, адрес и заголовки доходят до
+        приложения WSGI.
+        """
+        def echo(environ, start_response):
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            return [environ['QUERY_STRING'].encode(), b'|',
+                    environ['wsgi.input'].read(), b'|',
+                    environ['HTTP_COOKIE'].encode()]
+
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'POST',
+            'path': '/app/путь/', 'root_path': '/app',
+            'query_string': b'q=1', 'headers': [
+                (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+                (b'content-type', b'text/plain')],
+        }
+        chunks = [{'type': 'http.request', 'body': b'part1-',
+                   'more_body': True},
+                  {'type': 'http.request', 'body': b'part2'}]
+        messages = []
+
+        async def receive():
+            return chunks.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(ThreadedWsgiToAsgi(echo)(scope, receive, send))
+        self.assertEqual(messages[0]['status'], HTTPStatus.CREATED)
+        self.assertEqual(messages[0]['headers'],
+                         [(b'x-path', '/путь/'.encode())])
+        body = b''.join(message['body'] for message in messages[1:])
+        self.assertEqual(body, b'q=1|part1-part2|a=1; b=2')
+        environ = build_environ(scope, None)
+        self.assertEqual(environ['SCRIPT_NAME'], '/app')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+
+
+class HoleTagTests(SimpleTestCase):
+    template = Template(
+        "{% load holes %}<main>{% hole 'includes/footer.html' year=1999 %}"
+        "</main>")
+
+    def test_hole_renders_inline(self):
+        """Вне каркаса {% hole %} работает как {% include %}."""
+        self.assertIn('© 1999', self.template.render(Context()))
+
+    def test_skeleton_holes_filled_per_request(self):
+        """В каркасе вместо дырки метка, которую заполняет fill_holes."""
+        with skeleton():
+            content = self.template.render(Context())
+        self.assertNotIn('Copyright', content)
+        request = RequestFactory().get('/')
+        filled = fill_holes(request, content.encode()).decode()
+        self.assertIn('<main><p>© 1999', filled)
+
+
+class PrecompileTemplatesTests(SimpleTestCase):
+    def templates(self, *dirs):
+        return [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [*dirs, settings.TEMPLATES_DIR],
+            'OPTIONS': {'loaders': [(
+                'django.template.loaders.cached.Loader',
+                ['django.template.loaders.filesystem.Loader'],
+            )]},
+        }]
+
+    def test_templates_compiled_into_cached_loader(self):
+        """Команда заранее кладет все шаблоны проекта в cached loader."""
+        with override_settings(TEMPLATES=self.templates()):
+            out = StringIO()
+            call_command('precompile_templates', stdout=out)
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('base.html', loader.get_template_cache)
+            self.assertIn('includes/header.html', loader.get_template_cache)
+            self.assertIn(
+                str(len(loader.get_template_cache)), out.getvalue())
+
+    def test_syntax_errors_reported(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with open(os.path.join(directory, 'broken.html'), 'w') as file:
+            file.write('{% if %}')
+        with override_settings(TEMPLATES=self.templates(directory)):
+            err = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('precompile_templates', stderr=err)
+            self.assertIn('broken.html', err.getvalue())
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    """Очередь задач: постановка, захват, повторы с паузой, письма."""
+
+    def setUp(self):
+        task_calls.clear()
+
+    def test_delay_enqueues_task(self):
+        record.delay('value')
+        self.assertEqual(task_calls, [])
+        queued = Task.objects.get()
+        self.assertEqual(queued.name, 'core.tests.record')
+        self.assertEqual(queued.status, Task.QUEUED)
+        (claimed,) = claim(10)
+        self.assertTrue(execute(claimed))
+        self.assertEqual(task_calls, ['value'])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_runs_immediately(self):
+        record.delay(['list'])
+        self.assertEqual(task_calls, [['list']])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claimed_task_not_claimed_twice(self):
+        record.delay(1)
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+        Task.objects.update(locked_until=timezone.now())
+        (reclaimed,) = claim(10)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_failed_task_retried_with_backoff(self):
+        """Ошибка возвращает задачу в очередь с паузой, после max_attempts
+        задача остается со статусом failed.
+        """
+        explode.delay()
+        (claimed,) = claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(execute(claimed))
+        retry = Task.objects.get()
+        self.assertEqual(retry.status, Task.QUEUED)
+        self.assertIn('Ошибка задачи', retry.last_error)
+        delay = (retry.run_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, settings.TASK_RETRY_DELAY, delta=2)
+        self.assertEqual(claim(10), [])
+        Task.objects.update(run_at=timezone.now())
+        (claimed,) = claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            execute(claimed)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual(claim(10), [])
+
+    @override_settings(EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+                       QUEUED_EMAIL_BACKEND='django.core.mail.backends.'
+                                            'locmem.EmailBackend')
+    def test_password_reset_email_queued(self):
+        User.objects.create_user(
+            username='reset', email='reset@example.com', password='pass')
+        Client().post(reverse('users:password_reset_form'),
+                      {'email': 'reset@example.com'})
+        self.assertEqual(mail.outbox, [])
+        (claimed,) = claim(10)
+        self.assertEqual(claimed.name, 'core.mail.send_email')
+        execute(claimed)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reset@example.com'])
+
+
+@override_settings(TASKS_EAGER=False)
+@override_settings(DATABASE_ROUTERS=['core.tests.TasksRouter'])
+class RunWorkerTests(SimpleTestCase):
+    """Воркер в нескольких потоках пишет в файл SQLite: в общей базе
+    в памяти параллельные записи падают с «table is locked».
+    """
+
+    databases = {TASKS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = attach_sqlite(TASKS)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        detach_sqlite(TASKS, cls.directory)
+
+    def setUp(self):
+        task_calls.clear()
+
+    def test_worker_runs_queued_tasks(self):
+        for value in range(5):
+            record.delay(value)
+        explode.delay()
+        out = StringIO()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            call_command('runworker', once=True, workers=3, stdout=out)
+        self.assertEqual(sorted(task_calls), list(range(5)))
+        self.assertIn('Выполнено задач: 5, с ошибкой: 1', out.getvalue())
+        self.assertEqual(Task.objects.get().name, 'core.tests.explode')
+
+
+class CachedSessionUserTests(TestCase):
+    """Пользователь сессии из кеша и его сброс."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='cached', password='old-password')
+        self.client = Client()
+        self.client.login(username='cached', password='old-password')
+        self.url = reverse('posts:follow_index')
+        self.client.get(self.url)
+
+    def test_user_loaded_from_cache(self):
+        """Повторный запрос не читает ни сессию, ни пользователя."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            user = self.client.get(url).wsgi_request.user
+            self.assertEqual(user.username, 'cached')
+
+    def test_password_hash_not_cached(self):
+        """В кеше нет хеша пароля; он читается из базы по требованию."""
+        cached = cache.get(user_key(self.user.pk))
+        self.assertNotIn('password', cached)
+        self.assertNotIn(self.user.password, cached.values())
+        user = self.client.get(self.url).wsgi_request.user
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('old-password'))
+
+    def test_password_change_keeps_own_session(self):
+        """После смены пароля своя сессия остается действительной."""
+        self.client.post(reverse('users:password_change_form'), {
+            'old_password': 'old-password',
+            'new_password1': 'new-Password-42',
+            'new_password2': 'new-Password-42',
+        })
+        self.assertTrue(User.objects.get(
+            pk=self.user.pk).check_password('new-Password-42'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_user_changes_invalidate_cache(self):
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.wsgi_request.user.first_name, 'Новое имя')
+
+    def test_password_change_ends_other_sessions(self):
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_inactive_user_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_sessions_of_model_backend_kept(self):
+        """Сессии, созданные с ModelBackend, остаются действительными."""
+        client = Client()
+        client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        client = Client()
+        client.login(username='cached', password='old-password')
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+
+@override_settings(RATE_LIMITS={'comment': '2/m', 'follow': '30/m'})
+class RateLimitTests(TestCase):
+    """Корзины токенов для пользователя и IP, 429 и сброс нагрузки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:add_comment',
+                           kwargs={'post_id': self.post.pk})
+
+    def login(self, username, address='127.0.0.1'):
+        client = Client(REMOTE_ADDR=address)
+        client.force_login(User.objects.create_user(username=username))
+        return client
+
+    def comment(self, client):
+        return client.post(self.url, {'text': 'Комментарий'})
+
+    def test_bucket_refills(self):
+        for _ in range(10):
+            self.assertEqual(take_token('refill', '10/s'), 0)
+        self.assertEqual(take_token('refill', '10/s'), 1)
+        time.sleep(0.1)
+        self.assertEqual(take_token('refill', '10/s'), 0)
+        self.assertEqual(take_token('refill', '10/s'), 1)
+
+    def test_too_many_comments(self):
+        """Сверх лимита — 429 с Retry-After, комментарий не создается."""
+        client = self.login('writer')
+        for _ in range(2):
+            self.assertEqual(self.comment(client).status_code,
+                             HTTPStatus.FOUND)
+        response = self.comment(client)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(client.get(self.url).status_code, HTTPStatus.FOUND)
+
+    def test_limits_by_user_and_ip(self):
+        """Лимит общий для одного IP и следует за пользователем на
+        другие адреса.
+        """
+        first = self.login('first')
+        self.comment(first)
+        self.comment(first)
+        same_address = self.login('second')
+        self.assertEqual(self.comment(same_address).status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+        other_address = self.login('third', address='10.0.0.2')
+        self.assertEqual(self.comment(other_address).status_code,
+                         HTTPStatus.FOUND)
+        first.defaults['REMOTE_ADDR'] = '10.0.0.3'
+        self.assertEqual(self.comment(first).status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_refused_user_keeps_ip_token(self):
+        """Отказ по корзине пользователя не тратит токен IP-адреса."""
+        first = self.login('first')
+        self.comment(first)
+        self.comment(first)
+        first.defaults['REMOTE_ADDR'] = '10.0.0.4'
+        for _ in range(3):
+            self.assertEqual(self.comment(first).status_code,
+                             HTTPStatus.TOO_MANY_REQUESTS)
+        other = self.login('other', address='10.0.0.4')
+        for _ in range(2):
+            self.assertEqual(self.comment(other).status_code,
+                             HTTPStatus.FOUND)
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_client_ip_from_proxy_header(self):
+        """За прокси адрес берется из последнего элемента заголовка."""
+        first = self.login('first')
+        first.defaults['HTTP_X_FORWARDED_FOR'] = '1.1.1.1, 10.0.0.5'
+        self.comment(first)
+        self.comment(first)
+        second = self.login('second')
+        second.defaults['HTTP_X_FORWARDED_FOR'] = '2.2.2.2, 10.0.0.6'
+        self.assertEqual(self.comment(second).status_code, HTTPStatus.FOUND)
+        third = self.login('third', address='10.0.0.7')
+        third.defaults['HTTP_X_FORWARDED_FOR'] = '9.9.9.9, 10.0.0.5'
+        self.assertEqual(self.comment(third).status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+
+    @override_settings(OVERLOAD_WINDOW=1)
+    def test_write_counter_outlives_window_under_load(self):
+        """Счетчик записей продлевается при каждом изменении и не
+        уходит ниже нуля после истечения.
+        """
+        _count_write(1)
+        time.sleep(0.6)
+        _count_write(1)
+        time.sleep(0.6)
+        self.assertEqual(cache.get(WRITES_KEY), 2)
+        cache.delete(WRITES_KEY)
+        _count_write(-1)
+        self.assertEqual(cache.get(WRITES_KEY), 0)
+
+    def test_overload_sheds_low_priority_requests(self):
+        """Пока записей больше OVERLOAD_MAX_WRITES, поиск получает 503,
+        а ленты и записи (подписки) выполняются как обычно.
+        """
+        client = self.login('reader')
+        cache.set(WRITES_KEY, settings.OVERLOAD_MAX_WRITES)
+        search = client.get(reverse('posts:search'), {'q': 'Текст'})
+        self.assertEqual(search.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', search)
+        follow = client.get(reverse('posts:profile_follow',
+                                    kwargs={'username': self.author}))
+        self.assertEqual(follow.status_code, HTTPStatus.FOUND)
+        self.assertEqual(client.get(reverse('posts:index')).status_code,
+                         HTTPStatus.OK)
+        cache.set(WRITES_KEY, 0)
+        self.assertEqual(
+            client.get(reverse('posts:search'), {'q': 'Текст'}).status_code,
+            HTTPStatus.OK)
+        self.comment(client)
+        self.assertEqual(cache.get(WRITES_KEY), 0)
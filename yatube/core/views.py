@@ -1,4 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+
+from .instrumentation import stats
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,13 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@never_cache
+@staff_member_required
+def request_stats(request):
+    """Статистика запросов текущего процесса по представлениям."""
+    if request.method == 'POST':
+        stats.reset()
+    return JsonResponse(stats.snapshot(), json_dumps_params={
+        'ensure_ascii': False})
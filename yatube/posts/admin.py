@@ -1,24 +1,97 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.exceptions import ImproperlyConfigured
+
 from .models import Post, Group, Comment, Follow
+from .paginators import EstimatedCountPaginator
+from .search import search_comment_ids, search_ids
+
+
+class UnlabeledRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id без подписи: подпись стоит запроса к базе на строку."""
+
+    def label_and_url_for_value(self, value):
+        return '', ''
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список большой таблицы без COUNT(*) по всей таблице."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class IndexSearchAdmin(LargeTableAdmin):
+    """Поиск по поисковому индексу вместо LIKE по всей таблице.
 
+    search_index(search_term, limit) — обязательная функция, которая
+    возвращает id найденных объектов. Индекс ищет целые слова, а не
+    подстроки. Выводится не больше search_results_limit совпадений; если
+    их больше, список сопровождается предупреждением.
+    """
 
-class PostAdmin(admin.ModelAdmin):
+    search_index = None
+    search_results_limit = 1000
+
+    def __init__(self, model, admin_site):
+        if self.search_index is None:
+            raise ImproperlyConfigured(
+                'В %s не задана функция search_index.'
+                % type(self).__name__)
+        super().__init__(model, admin_site)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        limit = self.search_results_limit
+        found = self.search_index(search_term, limit)
+        if len(found) >= limit:
+            self.message_user(
+                request,
+                'Показаны только первые %s совпадений: уточните запрос.'
+                % limit, messages.WARNING)
+        return queryset.filter(pk__in=found), False
+
+
+def search_post_ids(search_term, limit):
+    """Посты, в тексте которых есть все слова запроса."""
+    return [pk for _, pk in search_ids(search_term, limit, posts_only=True)]
+
+
+class PostAdmin(IndexSearchAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'author_id', 'group',)
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', )
+    raw_id_fields = ('group', )
     search_fields = ('text', )
+    # Фильтр по диапазону дат идет по индексу post_pub_date_idx.
     list_filter = ('pub_date', )
-    empty_value_display = '-пусто-'
+    search_index = staticmethod(search_post_ids)
 
+    def get_changelist_form(self, request, **kwargs):
+        """Группа в списке — поле id: название уже выводится колонкой."""
+        kwargs['widgets'] = {'group': UnlabeledRawIdWidget(
+            Post._meta.get_field('group').remote_field, self.admin_site)}
+        return super().get_changelist_form(request, **kwargs)
 
-class CommentAdmin(admin.ModelAdmin):
+
+class CommentAdmin(IndexSearchAdmin):
     list_display = ('pk', 'text', 'created', 'author')
+    list_select_related = ('author', )
+    autocomplete_fields = ('author', )
+    raw_id_fields = ('post', )
     search_fields = ('text', )
+    # Фильтр по диапазону дат идет по индексу comment_created_idx.
     list_filter = ('created', )
-    empty_value_display = '-пусто-'
+    search_index = staticmethod(search_comment_ids)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('id', 'user_id', 'user', 'author_id', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,493 @@
+import asyncio
+import copy
+import platform
+import re
+import statistics
+import subprocess
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from time import perf_counter
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.template_cache import precompile_templates
+from yatube.asgi import ThreadedWsgiToAsgi
+
+from . import urls
+from .admin import PostAdmin
+from .models import Comment, Follow, Group, Post
+from .seeding import seed
+from .utils import comments_page
+
+User = get_user_model()
+
+# Наборы данных: число пользователей и постов; подписки и комментарии
+# выводятся из них в posts.seeding.seed.
+DATASETS = {
+    'tiny': {'users': 50, 'posts': 500},
+    'small': {'users': 1000, 'posts': 10000},
+    'medium': {'users': 10000, 'posts': 100000},
+    'large': {'users': 10000, 'posts': 1000000},
+}
+PERCENTILES = (50, 90, 99)
+SEARCH_QUERY = 'кофе утро'
+# Адреса для замера пропускной способности под параллельной нагрузкой.
+THROUGHPUT_URLS = ('index', 'group_list', 'profile', 'post_detail')
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+# Число комментариев у поста при замере стоимости его страницы.
+COMMENT_COUNTS = (10, 1000, 20000)
+TEMPLATE_TIME_RE = re.compile(r'tpl;dur=([\d.]+)')
+# Модели, списки которых замеряются в админке.
+ADMIN_MODELS = ('post', 'comment', 'follow')
+
+
+class Scenario:
+    """Запрос к одному адресу posts.urls от имени заданного пользователя."""
+
+    def __init__(self, args=(), user=None, method='get', data=None,
+                 prepare=None):
+        self.args = args
+        self.user = user
+        self.method = method
+        self.data = data or {}
+        self.prepare = prepare
+
+
+def build_scenarios():
+    """Сценарии для всех адресов posts.urls на текущих данных.
+
+    Читатель — самый активный подписчик, автор — самый плодовитый,
+    пост — самый обсуждаемый, группа — самая большая.
+    """
+    reader = User.objects.annotate(
+        following_total=Count('follower')).order_by('-following_total')[0]
+    author = User.objects.order_by('-stats__posts_count', 'pk')[0]
+    post = Post.objects.order_by('-comments_count', '-pk')[0]
+    group = Group.objects.order_by('-posts_count', 'pk')[0]
+    stranger = User.objects.exclude(pk=reader.pk).exclude(
+        pk__in=Follow.objects.filter(user=reader).values('author_id')
+    ).order_by('pk')[0]
+
+    def unfollow():
+        Follow.objects.filter(user=reader, author=stranger).delete()
+
+    def follow():
+        Follow.objects.get_or_create(user=reader, author=stranger)
+
+    return {
+        'index': Scenario(),
+        'group_list': Scenario((group.slug,)),
+        'profile': Scenario((author.username,)),
+        'post_detail': Scenario((post.pk,)),
+        'post_comments': Scenario((post.pk,)),
+        'add_comment': Scenario(
+            (post.pk,), reader, 'post', {'text': 'Комментарий'}),
+        'post_create': Scenario(user=reader),
+        'post_edit': Scenario((post.pk,), post.author),
+        'follow_index': Scenario(user=reader),
+        'search': Scenario(data={'q': SEARCH_QUERY}),
+        'profile_follow': Scenario(
+            (stranger.username,), reader, prepare=unfollow),
+        'profile_unfollow': Scenario(
+            (stranger.username,), reader, prepare=follow),
+    }
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    result = {
+        'p%s' % percent: round(
+            timings[min(len(timings) - 1, len(timings) * percent // 100)]
+            * 1000, 3)
+        for percent in PERCENTILES
+    }
+    result['mean'] = round(statistics.mean(timings) * 1000, 3)
+    result['max'] = round(timings[-1] * 1000, 3)
+    return result
+
+
+def _prepare(scenario, cold):
+    if cold:
+        cache.clear()
+    if scenario.prepare:
+        scenario.prepare()
+
+
+def _request(client, scenario, path):
+    return getattr(client, scenario.method)(path, scenario.data)
+
+
+def measure(client, scenario, path, iterations, cold):
+    """Время ответов (мс) и число запросов в режиме cold или warm.
+
+    В режиме cold кеш очищается перед каждым запросом, в warm — один
+    раз прогревается первым запросом.
+    """
+    if not cold:
+        _prepare(scenario, cold)
+        _request(client, scenario, path)
+    timings = []
+    for _ in range(iterations):
+        _prepare(scenario, cold)
+        start = perf_counter()
+        _request(client, scenario, path)
+        timings.append(perf_counter() - start)
+    _prepare(scenario, cold)
+    with CaptureQueriesContext(connection) as queries:
+        response = _request(client, scenario, path)
+    result = percentiles(timings)
+    result['queries'] = len(queries)
+    return result, response.status_code
+
+
+def peak_memory(client, scenario, path):
+    """Пик выделенной Python памяти (КБ) за один запрос с пустым кешем."""
+    _prepare(scenario, True)
+    tracemalloc.start()
+    try:
+        _request(client, scenario, path)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run_urls(iterations, scenarios=None):
+    """Замеры для каждого адреса posts.urls на данных текущей базы."""
+    scenarios = scenarios or build_scenarios()
+    clients = {}
+    results = {}
+    for pattern in urls.urlpatterns:
+        name = '%s:%s' % (urls.app_name, pattern.name)
+        scenario = scenarios.get(pattern.name)
+        if scenario is None:
+            results[name] = {'skipped': True}
+            continue
+        if scenario.user not in clients:
+            clients[scenario.user] = Client()
+            if scenario.user is not None:
+                clients[scenario.user].force_login(scenario.user)
+        client = clients[scenario.user]
+        path = reverse(name, args=scenario.args)
+        cold, status = measure(client, scenario, path, iterations, True)
+        warm, _ = measure(client, scenario, path, iterations, False)
+        results[name] = {
+            'method': scenario.method.upper(),
+            'path': path,
+            'status': status,
+            'cold': cold,
+            'warm': warm,
+            'memory_peak_kb': peak_memory(client, scenario, path),
+        }
+    return results
+
+
+def _wsgi_request(application, path):
+    environ = RequestFactory()._base_environ(PATH_INFO=path)
+    statuses = []
+    response = application(
+        environ, lambda status, headers: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def _asgi_request(application, path):
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'root_path': '',
+        'query_string': b'', 'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def _throughput_result(started, results):
+    elapsed = perf_counter() - started
+    result = percentiles([timing for _, timing in results])
+    result['requests_per_second'] = round(len(results) / elapsed, 1)
+    result['errors'] = sum(status >= 400 for status, _ in results)
+    return result
+
+
+def wsgi_throughput(path, concurrency, requests):
+    """Обработчик WSGI под нагрузкой concurrency потоков, как
+    у многопоточного сервера.
+    """
+    application = WSGIHandler()
+
+    def timed(_):
+        start = perf_counter()
+        status = _wsgi_request(application, path)
+        return status, perf_counter() - start
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    return _throughput_result(started, results)
+
+
+def asgi_throughput(path, concurrency, requests):
+    """Приложение ASGI (yatube.asgi) с concurrency одновременными
+    запросами в одном цикле событий.
+    """
+    application = ThreadedWsgiToAsgi(WSGIHandler())
+
+    async def load():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with semaphore:
+                start = perf_counter()
+                status = await _asgi_request(application, path)
+                return status, perf_counter() - start
+
+        return await asyncio.gather(*(timed() for _ in range(requests)))
+
+    started = perf_counter()
+    results = asyncio.run(load())
+    return _throughput_result(started, results)
+
+
+def run_throughput(concurrency, requests, scenarios=None, names=None):
+    """Пропускная способность гостевых страниц через WSGI и ASGI.
+
+    Каждый адрес сначала прогревается одним запросом, чтобы оба пути
+    работали с одинаковым кешем.
+    """
+    scenarios = scenarios or build_scenarios()
+    results = {}
+    for name in names or THROUGHPUT_URLS:
+        scenario = scenarios[name]
+        path = reverse('%s:%s' % (urls.app_name, name), args=scenario.args)
+        Client().get(path)
+        results['%s:%s' % (urls.app_name, name)] = {
+            'path': path,
+            'wsgi': wsgi_throughput(path, concurrency, requests),
+            'asgi': asgi_throughput(path, concurrency, requests),
+        }
+    return results
+
+
+def templates_setting(cached):
+    """Копия settings.TEMPLATES с cached loader или без него."""
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for config in templates:
+        loaders = config.get('OPTIONS', {}).get('loaders')
+        if not loaders:
+            continue
+        if isinstance(loaders[0], (list, tuple)) and (
+                loaders[0][0] == CACHED_LOADER):
+            loaders = loaders[0][1]
+        config['OPTIONS']['loaders'] = (
+            [(CACHED_LOADER, loaders)] if cached else loaders)
+    return templates
+
+
+def template_time(client, path, iterations):
+    """Время рендеринга шаблонов (мс) из заголовка Server-Timing.
+
+    Кеш очищается перед каждым запросом, чтобы рендерились и
+    закешированные фрагменты.
+    """
+    timings = []
+    for _ in range(iterations):
+        cache.clear()
+        response = client.get(path)
+        match = TEMPLATE_TIME_RE.search(response.get('Server-Timing', ''))
+        timings.append(float(match.group(1)) / 1000 if match else 0)
+    return percentiles(timings)
+
+
+def run_template_render(iterations, scenarios=None):
+    """Время рендеринга гостевых GET-страниц без cached loader и с ним
+    (после precompile_templates).
+    """
+    scenarios = scenarios or build_scenarios()
+    paths = {
+        '%s:%s' % (urls.app_name, name): reverse(
+            '%s:%s' % (urls.app_name, name), args=scenario.args)
+        for name, scenario in scenarios.items()
+        if scenario.user is None and scenario.method == 'get'
+    }
+    results = {name: {'path': path} for name, path in paths.items()}
+    with override_settings(PAGE_CACHE=False,
+                           REQUEST_STATS_SERVER_TIMING=True):
+        for mode, cached in (('uncached', False), ('cached', True)):
+            with override_settings(TEMPLATES=templates_setting(cached)):
+                if cached:
+                    precompile_templates()
+                client = Client()
+                for name, path in paths.items():
+                    results[name][mode] = template_time(
+                        client, path, iterations)
+    return results
+
+
+def run_comment_pages(iterations, counts=COMMENT_COUNTS):
+    """Стоимость страницы поста и следующей страницы комментариев для
+    постов с разным числом комментариев.
+
+    Время, запросы и размер ответа не должны расти с числом комментариев.
+    """
+    author = User.objects.order_by('pk')[0]
+    client = Client()
+    results = {}
+    with override_settings(PAGE_CACHE=False):
+        for count in counts:
+            post = Post.objects.create(text='Обсуждаемый пост', author=author)
+            Comment.objects.bulk_create(
+                Comment(text='Комментарий %s' % index, author=author,
+                        post=post)
+                for index in range(count)
+            )
+            detail = reverse('posts:post_detail', args=(post.pk,))
+            response = client.get(detail)
+            scenario = Scenario()
+            result, _ = measure(client, scenario, detail, iterations, True)
+            result['bytes'] = len(response.content)
+            cursor = comments_page(post.pk).next_cursor
+            more = '%s?cursor=%s' % (
+                reverse('posts:post_comments', args=(post.pk,)), cursor or '')
+            fragment, _ = measure(client, scenario, more, iterations, True)
+            fragment['bytes'] = len(client.get(more).content)
+            results[count] = {'post_detail': result, 'post_comments': fragment}
+            post.delete()
+    return results
+
+
+def admin_changelists():
+    """Адреса списков админки: первая и далекая страница, фильтр по дате
+    и поиск.
+    """
+    paths = {
+        name: (reverse('admin:posts_%s_changelist' % name), {})
+        for name in ADMIN_MODELS
+    }
+    posts = paths['post'][0]
+    last_page = (Post.objects.count() - 1) // PostAdmin.list_per_page
+    paths['post_page_100'] = (posts, {'p': max(0, min(99, last_page))})
+    paths['post_last_week'] = (posts, {
+        'pub_date__gte': timezone.now() - timedelta(days=7)})
+    paths['post_search'] = (posts, {'q': SEARCH_QUERY})
+    return paths
+
+
+def run_admin_changelists(iterations):
+    """Время загрузки и число запросов списков Post, Comment и Follow
+    в админке от имени суперпользователя.
+    """
+    admin = User.objects.create_superuser(
+        'benchmark-admin', 'admin@example.com', 'password')
+    client = Client()
+    client.force_login(admin)
+    results = {}
+    for name, (path, data) in admin_changelists().items():
+        result, status = measure(
+            client, Scenario(data=data), path, iterations, False)
+        results[name] = {'path': path, 'status': status, **result}
+    admin.delete()
+    return results
+
+
+def run_dataset(rows, iterations, random_seed=0, concurrency=0,
+                requests=200, templates=False, comments=False, admin=False):
+    """Заполняет текущую базу набором rows и замеряет все адреса.
+
+    При concurrency > 0 дополнительно замеряет пропускную способность
+    WSGI и ASGI (requests запросов на адрес), с templates — время
+    рендеринга без cached loader и с ним, с comments — стоимость
+    страницы поста в зависимости от числа комментариев, с admin — списки
+    моделей в админке.
+    """
+    start = perf_counter()
+    counts = seed(random_seed=random_seed, **rows)
+    seed_seconds = perf_counter() - start
+    cache.clear()
+    result = {
+        'rows': counts,
+        'seed_seconds': round(seed_seconds, 2),
+        'urls': run_urls(iterations),
+    }
+    if concurrency:
+        result['throughput'] = run_throughput(concurrency, requests)
+    if templates:
+        result['templates'] = run_template_render(iterations)
+    if comments:
+        result['comments'] = run_comment_pages(iterations)
+    if admin:
+        result['admin'] = run_admin_changelists(iterations)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(iterations):
+    return {
+        'commit': git_commit(),
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'iterations': iterations,
+    }
+
+
+def compare(previous, current, threshold=1.2):
+    """Регрессии относительно прошлых результатов.
+
+    Возвращает строки вида «набор адрес метрика: было -> стало» для
+    роста p90 более чем в threshold раз и для любого роста числа
+    запросов.
+    """
+    regressions = []
+    for dataset, result in current['datasets'].items():
+        old_urls = previous.get('datasets', {}).get(dataset, {}).get(
+            'urls', {})
+        for name, data in result['urls'].items():
+            old = old_urls.get(name)
+            if not old or data.get('skipped') or old.get('skipped'):
+                continue
+            for mode in ('cold', 'warm'):
+                checks = (
+                    ('p90', old[mode]['p90'] * threshold),
+                    ('queries', old[mode]['queries']),
+                )
+                for metric, limit in checks:
+                    if data[mode][metric] > limit:
+                        regressions.append('%s %s %s %s: %s -> %s' % (
+                            dataset, name, mode, metric,
+                            old[mode][metric], data[mode][metric]))
+    return regressions
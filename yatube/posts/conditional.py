@@ -0,0 +1,185 @@
+import hashlib
+import time
+from functools import wraps
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+
+from core.db_router import using_replica
+from core.holes import fill_holes, skeleton
+
+from .feed_cache import (INDEX_SCOPE, SHARED_SCOPES, cache_timeout,
+                         follows_scope, get_version, group_scope, post_scope,
+                         profile_scope)
+from .models import Group, Post
+
+
+# Параметры запроса, от которых зависит страница.
+PAGE_PARAMS = ('page', 'cursor')
+
+
+def page_path(request):
+    """Адрес страницы только с параметрами из PAGE_PARAMS.
+
+    Прочие параметры (метки utm и т. п.) не меняют страницу и не должны
+    плодить записи в кеше и ETag.
+    """
+    params = [(name, request.GET[name]) for name in PAGE_PARAMS
+              if name in request.GET]
+    if not params:
+        return request.path
+    return '%s?%s' % (request.path, urlencode(params))
+
+
+def page_etag(request, version):
+    """ETag страницы по версии ее областей кеша, без запросов к базе.
+
+    Версии меняются сигналами при изменении постов, комментариев,
+    групп и пользователей. Для вошедшего пользователя в ETag входят его
+    id, CSRF-cookie и версия его подписок: от них зависят шапка, формы
+    и кнопки подписки.
+    """
+    parts = [version, page_path(request)]
+    user = request.user
+    if user.is_authenticated:
+        parts.append(str(user.pk))
+        parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        parts.append(get_version(follows_scope(user.pk)))
+    if using_replica():
+        # Страница с отстающей реплики не должна жить под новой версией
+        # дольше окна закрепления за основной базой.
+        parts.append(
+            str(int(time.time() // settings.DATABASE_REPLICA_PIN_SECONDS)))
+    return quote_etag(hashlib.md5(':'.join(parts).encode()).hexdigest())
+
+
+def page_key(request, version):
+    """Ключ страницы в кеше: общий для всех гостей и отдельный общий
+    каркас для всех вошедших пользователей.
+    """
+    audience = 'user' if request.user.is_authenticated else 'guest'
+    token = '%s:%s:%s' % (version, audience, page_path(request))
+    return 'page:%s' % hashlib.md5(token.encode()).hexdigest()
+
+
+def cached_response(request, view, version, *args, **kwargs):
+    """Ответ из кеша страниц или отрендеренный и сохраненный в нем.
+
+    Гостям отдается готовая страница. Вошедшим — общий каркас, в котором
+    части из {% hole %} (шапка, кнопка подписки, форма комментария)
+    рендерятся для текущего пользователя.
+    """
+    authenticated = request.user.is_authenticated
+    key = page_key(request, version)
+    cached = cache.get(key)
+    if cached is None:
+        with skeleton(authenticated):
+            response = view(request, *args, **kwargs)
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(key, (response.content, response['Content-Type']),
+                      cache_timeout())
+    else:
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+    if authenticated and not response.streaming:
+        response.content = fill_holes(request, response.content)
+    return response
+
+
+def conditional_page(get_scopes):
+    """Кеш страниц, условный GET (ETag, 304) и Cache-Control.
+
+    get_scopes(request, *args, **kwargs) возвращает области кеша, из
+    которых собрана страница. Ленты группы и профиля задаются адресом
+    и отдаются из кеша без запросов к базе; странице поста нужен автор,
+    его get_scopes загружает через get_post, и представление
+    переиспользует объект.
+    При совпадении If-None-Match представление не вызывается, иначе
+    страница по возможности берется из кеша (PAGE_CACHE). Гостям
+    страница отдается как public на ANONYMOUS_CACHE_MAX_AGE секунд для
+    обратного прокси, вошедшим пользователям — как private
+    с обязательной перепроверкой.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            version = get_version(*SHARED_SCOPES, *scopes)
+            etag = page_etag(request, version)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                if settings.PAGE_CACHE:
+                    response = cached_response(
+                        request, view, version, *args, **kwargs)
+                else:
+                    response = view(request, *args, **kwargs)
+                if response.status_code != HTTPStatus.OK:
+                    return response
+            elif response.status_code != HTTPStatus.NOT_MODIFIED:
+                return response
+            # 304 несет те же ETag и Cache-Control (RFC 7232, 4.1).
+            response.setdefault('ETag', etag)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.ANONYMOUS_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
+
+
+def _page_object(request, queryset, **filters):
+    """get_object_or_404 один раз за запрос: объект страницы нужен и для
+    ETag, и представлению.
+    """
+    page_object = getattr(request, '_page_object', None)
+    if page_object is None:
+        page_object = get_object_or_404(queryset, **filters)
+        request._page_object = page_object
+    return page_object
+
+
+def get_group(request, slug):
+    return _page_object(request, Group, slug=slug)
+
+
+def get_author(request, username):
+    return _page_object(
+        request, User.objects.select_related('stats'), username=username)
+
+
+def get_post(request, post_id):
+    return _page_object(
+        request,
+        Post.objects.select_related('author', 'group', 'author__stats'),
+        pk=post_id)
+
+
+def index_scopes(request):
+    return [INDEX_SCOPE]
+
+
+def group_scopes(request, slug):
+    return [group_scope(slug)]
+
+
+def profile_scopes(request, username):
+    return [profile_scope(username)]
+
+
+def post_scopes(request, post_id):
+    # Профиль автора: на странице поста выводится число его постов.
+    return [post_scope(post_id),
+            profile_scope(get_post(request, post_id).author.username)]
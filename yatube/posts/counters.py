@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _change(queryset, field, delta):
+    """Атомарно сдвигает счетчик, не опуская его ниже нуля."""
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_user_stat(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not _change(stats, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        _change(stats, field, delta)
+
+
+def change_group_posts(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post_comments(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def get_user_stats(user):
+    """Счетчики пользователя; для пользователя без записи — нули.
+
+    Несохраненная запись создается по user_id: присваивание объекта
+    выбирает базу через db_for_write, и чтение профиля закрепило бы
+    сессию за основной базой (см. core.db_router).
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user_id=user.pk)
+
+
+def _count(queryset, field):
+    """Подзапрос с числом строк queryset, связанных с внешней записью."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def reconcile():
+    """Пересчитывает все счетчики по фактическим данным."""
+    missing = User.objects.filter(
+        stats__isnull=True).values_list('pk', flat=True)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post.objects.all(), 'group'))
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), 'post'))
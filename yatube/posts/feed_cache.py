@@ -0,0 +1,151 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+
+from core.db_router import using_replica
+
+from .models import Comment, Post
+from .paginators import CursorPage, CursorPaginator
+from .utils import paginate
+
+INDEX_SCOPE = 'index'
+GROUPS_SCOPE = 'groups'
+# Области, от которых зависят все страницы: названия групп.
+SHARED_SCOPES = (GROUPS_SCOPE, )
+
+
+def group_scope(slug):
+    """Лента группы; ключ по slug из адреса, чтобы ETag и кеш страницы
+    обходились без запроса к базе.
+    """
+    return 'group:%s' % slug
+
+
+def profile_scope(username):
+    """Профиль автора; ключ по имени пользователя из адреса."""
+    return 'profile:%s' % username
+
+
+def post_scope(post_id):
+    return 'post:%s' % post_id
+
+
+def follows_scope(user_id):
+    """Подписки пользователя: от них зависят кнопки на профилях."""
+    return 'follows:%s' % user_id
+
+
+def _version_key(scope):
+    return 'feed-version:%s' % scope
+
+
+def get_version(*scopes):
+    """Текущая версия ленты: склейка поколений всех ее областей."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+def bump_version(*scopes):
+    """Делает устаревшими все закешированные страницы областей."""
+    cache.set_many(
+        {_version_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def bump_post_feeds(username, *slugs, post_id=None):
+    """Сбрасывает ленты, в которые входит пост автора, и страницу поста."""
+    scopes = [INDEX_SCOPE, profile_scope(username)]
+    scopes.extend(group_scope(slug) for slug in slugs if slug is not None)
+    if post_id is not None:
+        scopes.append(post_scope(post_id))
+    bump_version(*scopes)
+
+
+def bump_author_feeds(author_id, *usernames):
+    """Сбрасывает страницы, на которых выводится имя автора.
+
+    Это главная, профили по всем его именам (прежнему и новому), группы
+    и страницы его постов, а также посты, где он оставлял комментарии.
+    """
+    posts = Post.objects.filter(author_id=author_id).order_by()
+    groups = posts.exclude(group=None).values_list(
+        'group__slug', flat=True).distinct()
+    commented = Comment.objects.filter(
+        author_id=author_id).order_by().values_list('post_id', flat=True)
+    bump_version(
+        INDEX_SCOPE,
+        *(profile_scope(username) for username in usernames),
+        *(group_scope(slug) for slug in groups),
+        *(post_scope(post_id) for post_id in posts.values_list(
+            'pk', flat=True).union(commented)),
+    )
+
+
+def cache_timeout():
+    """Время жизни записей с ключом по версии."""
+    if using_replica():
+        # Реплика может отставать от новой версии: такая страница живет
+        # не дольше окна закрепления за основной базой.
+        return min(settings.FEED_CACHE_TIMEOUT,
+                   settings.DATABASE_REPLICA_PIN_SECONDS)
+    return settings.FEED_CACHE_TIMEOUT
+
+
+def _page_token(request):
+    """Ключ страницы: курсор или номер страницы (см. utils.paginate)."""
+    if 'page' in request.GET and 'cursor' not in request.GET:
+        token = 'p' + request.GET.get('page', '1')
+    else:
+        token = 'c' + request.GET.get('cursor', '')
+    return hashlib.md5(token.encode()).hexdigest()
+
+
+def _dump_page(page):
+    if isinstance(page, CursorPage):
+        return ('cursor', list(page.object_list), page.paginator.per_page,
+                page.cursor, page.next_cursor, page.previous_cursor)
+    return ('page', list(page.object_list), page.paginator.per_page,
+            page.number, page.paginator.count)
+
+
+def _load_page(queryset, data):
+    kind, object_list, per_page, *rest = data
+    if kind == 'cursor':
+        paginator = CursorPaginator(queryset, per_page)
+        return CursorPage(object_list, paginator, *rest)
+    number, count = rest
+    paginator = Paginator(queryset, per_page)
+    paginator.count = count
+    return Page(object_list, number, paginator)
+
+
+def cached_feed(request, queryset, *scopes):
+    """Контекст ленты со страницей из кеша с ключом по версии областей.
+
+    Версии меняются сигналами при изменении постов и комментариев,
+    поэтому запись может жить долго, а попадание в кеш не требует
+    запросов к базе. Версия и время жизни передаются в шаблон для
+    кеширования фрагмента ленты.
+    """
+    version = get_version(*SHARED_SCOPES, *scopes)
+    key = 'feed-page:%s:%s:%s' % (
+        ':'.join(scopes), version, _page_token(request))
+    timeout = cache_timeout()
+    data = cache.get(key)
+    if data is None:
+        page = paginate(request, queryset)
+        cache.set(key, _dump_page(page), timeout)
+    else:
+        page = _load_page(queryset, data)
+    return {
+        'page_obj': page,
+        'feed_version': version,
+        'feed_cache_timeout': timeout,
+    }
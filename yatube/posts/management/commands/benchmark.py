@@ -0,0 +1,96 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов и память для всех адресов '
+        'posts.urls на наборах данных разного размера. Данные создаются '
+        'во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets', default='small',
+            help='Наборы через запятую: %s.' % ', '.join(benchmark.DATASETS))
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='Прошлые результаты для поиска регрессий.')
+        parser.add_argument('--threshold', type=float, default=1.2)
+        parser.add_argument(
+            '--concurrency', type=int, default=0,
+            help='Одновременных запросов при замере пропускной способности '
+                 'WSGI и ASGI; 0 — без замера.')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на адрес при замере пропускной способности.')
+        parser.add_argument(
+            '--templates', action='store_true',
+            help='Замерить время рендеринга без cached loader и с ним.')
+        parser.add_argument(
+            '--comments', action='store_true',
+            help='Замерить страницу поста с %s комментариями.' % ', '.join(
+                map(str, benchmark.COMMENT_COUNTS)))
+        parser.add_argument(
+            '--admin', action='store_true',
+            help='Замерить списки постов, комментариев и подписок '
+                 'в админке.')
+
+    def handle(self, *args, **options):
+        names = options['datasets'].split(',')
+        unknown = set(names) - set(benchmark.DATASETS)
+        if unknown:
+            raise CommandError('Неизвестные наборы: %s.' % ', '.join(unknown))
+        results = {
+            'meta': benchmark.metadata(options['iterations']),
+            'datasets': {},
+        }
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(DEBUG=False, MEDIA_ROOT=media_root,
+                                   TASKS_EAGER=True,
+                                   RATE_LIMIT_ENABLED=False):
+                for name in names:
+                    results['datasets'][name] = self.run_dataset(
+                        name, options)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)
+            regressions = benchmark.compare(
+                previous, results, options['threshold'])
+            for line in regressions:
+                self.stderr.write(line)
+            if regressions:
+                raise CommandError('Найдено регрессий: %s.' % len(regressions))
+
+    def run_dataset(self, name, options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stderr.write('Набор %s...' % name)
+            return benchmark.run_dataset(
+                benchmark.DATASETS[name], options['iterations'],
+                options['seed'], options['concurrency'], options['requests'],
+                options['templates'], options['comments'], options['admin'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
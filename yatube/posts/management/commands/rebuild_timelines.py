@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок всех пользователей.'
+
+    def handle(self, *args, **options):
+        rebuild_all()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны.'))
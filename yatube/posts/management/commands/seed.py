@@ -0,0 +1,89 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу пользователями, группами, постами, подписками и '
+        'комментариями пачками. Распределения задаются параметрами, '
+        'при одном --seed данные совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--groups', type=int, default=None,
+            help='Число групп; по умолчанию одна на 100 пользователей.')
+        parser.add_argument(
+            '--comments', type=int, default=None,
+            help='Число комментариев; по умолчанию половина числа постов.')
+        parser.add_argument(
+            '--follows', type=int, default=None,
+            help='Число подписок; по умолчанию 10 на пользователя.')
+        parser.add_argument(
+            '--author-skew', type=float, default=1.1,
+            help='Показатель степенного закона постов на автора '
+                 '(0 — равномерно).')
+        parser.add_argument(
+            '--follower-skew', type=float, default=1.2,
+            help='Показатель степенного закона подписчиков на автора.')
+        parser.add_argument(
+            '--group-skew', type=float, default=1.0,
+            help='Показатель степенного закона размеров групп.')
+        parser.add_argument(
+            '--comment-skew', type=float, default=1.0,
+            help='Показатель степенного закона комментариев на пост.')
+        parser.add_argument(
+            '--group-share', type=float, default=0.6,
+            help='Доля постов в группах.')
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинками.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределены даты.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не раскладывать посты по лентам подписок '
+                 '(потом: manage.py rebuild_timelines).')
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не перестраивать поисковый индекс '
+                 '(потом: manage.py rebuild_search_index).')
+
+    def handle(self, *args, **options):
+        for name in ('group_share', 'image_share'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(
+                    '--%s должна быть от 0 до 1.' % name.replace('_', '-'))
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и пачка.')
+        start = perf_counter()
+        rows = Seeder(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            author_skew=options['author_skew'],
+            follower_skew=options['follower_skew'],
+            group_skew=options['group_skew'],
+            comment_skew=options['comment_skew'],
+            group_share=options['group_share'],
+            image_share=options['image_share'],
+            days=options['days'],
+            random_seed=options['seed'],
+            batch_size=options['batch_size'],
+            timelines=not options['skip_timelines'],
+            search_index=not options['skip_search_index'],
+        ).run()
+        self.stdout.write(self.style.SUCCESS(
+            'Создано за %.1f с: %s.' % (
+                perf_counter() - start,
+                ', '.join('%s %s' % item for item in rows.items()))))
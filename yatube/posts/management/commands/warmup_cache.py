@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кеш первых страниц главной и активных групп.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=None)
+        parser.add_argument('--groups', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rendered = warm_up(options['pages'], options['groups'])
+        self.stdout.write(
+            self.style.SUCCESS('Прогрето страниц: %s.' % rendered))
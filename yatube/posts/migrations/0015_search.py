@@ -0,0 +1,114 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:12
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+from posts.search import tokenize
+
+FTS_TABLE = 'posts_search_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'CREATE VIRTUAL TABLE %s USING fts5('
+                'post_id UNINDEXED, pub_ts UNINDEXED, body, '
+                "tokenize = 'unicode61 remove_diacritics 2')" % FTS_TABLE)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск работает по SearchPosting.
+            return
+        cursor.execute(
+            'INSERT INTO %s (rowid, post_id, pub_ts, body) '
+            "SELECT id, id, CAST(strftime('%%s', pub_date) AS INTEGER), text "
+            'FROM posts_post' % FTS_TABLE)
+        cursor.execute(
+            'INSERT INTO %s (rowid, post_id, pub_ts, body) '
+            "SELECT -c.id, c.post_id, "
+            "CAST(strftime('%%s', p.pub_date) AS INTEGER), c.text "
+            'FROM posts_comment c JOIN posts_post p ON p.id = c.post_id'
+            % FTS_TABLE)
+
+
+def has_fts_table(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def fill_postings(apps, schema_editor):
+    """Заполняет SearchPosting, если поиск пойдет по нему: без FTS5 или
+    с SEARCH_BACKEND = 'python'. После смены бэкенда индекс
+    перестраивается командой rebuild_search_index.
+    """
+    if (settings.SEARCH_BACKEND != 'python'
+            and has_fts_table(schema_editor.connection)):
+        return
+    db = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    postings = apps.get_model('posts', 'SearchPosting').objects.using(db)
+    batch = []
+    documents = [
+        ((post_id, None, text) for post_id, text in
+         Post.objects.using(db).values_list('id', 'text').iterator()),
+        ((post_id, comment_id, text) for comment_id, post_id, text in
+         Comment.objects.using(db).values_list(
+             'id', 'post_id', 'text').iterator()),
+    ]
+    for rows in documents:
+        for post_id, comment_id, text in rows:
+            batch.extend(
+                postings.model(term=term, post_id=post_id,
+                               comment_id=comment_id, frequency=frequency)
+                for term, frequency in Counter(tokenize(text)).items())
+            if len(batch) >= 1000:
+                postings.bulk_create(batch)
+                batch = []
+    postings.bulk_create(batch)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Терм')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Частота')),
+                ('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Записи поискового индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:40
+
+import math
+
+from django.db import migrations, models
+
+
+def fill_weights(apps, schema_editor):
+    postings = apps.get_model('posts', 'SearchPosting').objects.using(
+        schema_editor.connection.alias)
+    frequencies = postings.values_list('frequency', flat=True).distinct()
+    for frequency in list(frequencies):
+        postings.filter(frequency=frequency).update(
+            weight=1 + math.log(frequency))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='weight',
+            field=models.FloatField(default=1, verbose_name='Вес'),
+        ),
+        migrations.RunPython(fill_weights, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+import json
+
 from django import template
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -12,6 +15,8 @@ class Group(models.Model):
                              verbose_name='Название группы')
     slug = models.SlugField(max_length=200, unique=True, verbose_name='Путь')
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -44,14 +49,43 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False)
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры', max_length=255, blank=True, editable=False)
+    image_variants = models.TextField(
+        'Варианты картинки', blank=True, editable=False)
 
     def __str__(self):
         return self.text[:15]
 
+    def image_sources(self):
+        """Пары (MIME-тип, srcset) по манифесту вариантов картинки."""
+        try:
+            manifest = json.loads(self.image_variants)
+        except ValueError:
+            return []
+        base = settings.MEDIA_URL + manifest['b']
+        return [
+            ('image/' + fmt, ', '.join(
+                '%s-%s.%s %sw' % (base, width, fmt, width)
+                for width in manifest['w']
+            ))
+            for fmt in manifest['f']
+        ]
+
     class Meta:
         ordering = ('-pub_date', '-pk')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -81,6 +115,12 @@ class Comment(models.Model):
         ordering = ('-created', '-pk')
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['-created', '-id'],
+                         name='comment_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -102,3 +142,87 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_subscribers_and_authors'),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Запись персональной ленты подписок (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_user_post'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class SearchPosting(models.Model):
+    """Запись обратного индекса поиска (для баз без FTS5)."""
+    term = models.CharField('Терм', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_postings',
+        verbose_name='Пост'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='search_postings',
+        verbose_name='Комментарий'
+    )
+    frequency = models.PositiveIntegerField('Частота')
+    weight = models.FloatField('Вес', default=1)
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        indexes = [
+            models.Index(fields=['term', 'post'],
+                         name='search_term_post_idx'),
+        ]
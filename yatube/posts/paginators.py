@@ -0,0 +1,232 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Сколько соседних страниц показывать по обе стороны от текущей.
+PAGE_WINDOW = 2
+# Таблицы меньше этого размера считаются точным COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def page_window(number, num_pages, window=PAGE_WINDOW):
+    """Номера страниц для навигации: первая, последняя и window страниц
+    вокруг текущей; None на месте пропуска.
+
+    Длина списка не больше 2 * window + 5 при любом числе страниц.
+    Пропуск в одну страницу заменяется ее номером.
+    """
+    pages = sorted({
+        1, num_pages,
+        *range(max(1, number - window), min(num_pages, number + window) + 1)
+    })
+    result = []
+    previous = 0
+    for page in pages:
+        if page - previous == 2:
+            result.append(previous + 1)
+        elif page - previous > 2:
+            result.append(None)
+        result.append(page)
+        previous = page
+    return result
+
+
+def encode_token(data):
+    """Упаковывает JSON-совместимые данные в непрозрачный курсор."""
+    raw = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+
+
+def estimated_count(queryset, threshold=ESTIMATED_COUNT_THRESHOLD):
+    """Оценка числа строк всей таблицы без COUNT(*) или None.
+
+    PostgreSQL берет оценку из статистики планировщика (pg_class),
+    SQLite — разность крайних первичных ключей по индексу, с учетом
+    удаленных строк она завышена. Для отфильтрованных выборок и таблиц
+    меньше threshold возвращает None: их нужно считать точно.
+    """
+    query = queryset.query
+    if query.where or query.distinct or not query.can_filter():
+        return None
+    connection = connections[queryset.db]
+    meta = queryset.model._meta
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [meta.db_table])
+        elif connection.vendor == 'sqlite':
+            pk = connection.ops.quote_name(meta.pk.column)
+            cursor.execute('SELECT MAX(%s) - MIN(%s) + 1 FROM %s' % (
+                pk, pk, connection.ops.quote_name(meta.db_table)))
+        else:
+            return None
+        row = cursor.fetchone()
+    estimate = int(row[0] or 0) if row else 0
+    return estimate if estimate >= threshold else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по всей большой таблице.
+
+    Число строк без фильтров берется из estimated_count, поэтому
+    последние страницы могут оказаться пустыми или недоступными.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None:
+            return super().count
+        return estimate
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору без COUNT(*) и OFFSET.
+
+    Номера у страницы нет (number — None): соседние страницы
+    открываются курсорами next_cursor и previous_cursor.
+    """
+
+    def __init__(self, object_list, paginator, cursor='',
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage %r>' % self.cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки модели (например, ('-pub_date', '-pk')).
+
+    Вместо номера страницы использует непрозрачный курсор со значениями
+    ключа крайней записи, поэтому стоимость любой страницы одинакова.
+    count и num_pages унаследованы от Paginator и считаются только
+    по требованию.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        super().__init__(object_list, per_page)
+        self.model = object_list.model
+        self.ordering = tuple(ordering or self.model._meta.ordering)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for field_name in self._field_names():
+            value = getattr(obj, field_name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return encode_token([direction, values])
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = decode_token(cursor)
+            field_names = self._field_names()
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(values) != len(field_names)):
+                raise InvalidCursor(cursor)
+            values = [
+                self.model._meta.get_field(name).to_python(value)
+                for name, value in zip(field_names, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def page(self, cursor=None):
+        """Возвращает страницу после (или до) записи из курсора."""
+        if not cursor:
+            return self._build_page(
+                self._fetch(self.object_list, reverse=False), '', NEXT,
+                has_more_before=False)
+        direction, values = self.decode_cursor(cursor)
+        reverse = direction == PREVIOUS
+        queryset = self.object_list.filter(self._keyset_q(values, reverse))
+        rows = self._fetch(queryset, reverse)
+        return self._build_page(rows, cursor, direction, has_more_before=True)
+
+    def get_page(self, cursor=None):
+        """Как page(), но с откатом на первую страницу при битом курсоре."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _field_names(self):
+        names = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name == 'pk':
+                names.append(self.model._meta.pk.attname)
+            else:
+                names.append(self.model._meta.get_field(name).attname)
+        return names
+
+    def _keyset_q(self, values, reverse):
+        """Условие «строго после ключа» для сортировки ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _fetch(self, queryset, reverse):
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else '-' + field
+                for field in ordering
+            )
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _build_page(self, rows, cursor, direction, has_more_before):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, has_more_before
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], NEXT)
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], PREVIOUS)
+        return CursorPage(rows, self, cursor, next_cursor, previous_cursor)
@@ -0,0 +1,298 @@
+import math
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Comment, Post, SearchPosting
+from .paginators import (CursorPage, InvalidCursor, decode_token,
+                         encode_token, estimated_count)
+
+FTS_TABLE = 'posts_search_fts'
+TERM_MAX_LENGTH = 64
+SECONDS_PER_DAY = 86400
+
+TOKEN_RE = re.compile(r'\w+')
+
+_fts_available = {}
+
+
+def tokenize(text):
+    return [
+        token[:TERM_MAX_LENGTH] for token in TOKEN_RE.findall(text.lower())
+    ]
+
+
+def _timestamp(value):
+    return int(value.timestamp())
+
+
+def _least_sql():
+    return 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+
+
+def recency_sql(timestamp_sql, now):
+    """SQL и параметры множителя свежести поста на момент now.
+
+    Множитель равен 1 + SEARCH_RECENCY_BOOST у нового поста и убывает
+    к 1 как 1 / (1 + возраст / SEARCH_RECENCY_HALF_LIFE дней). Он
+    умножает релевантность, а не прибавляется к ней, поэтому не зависит
+    от масштаба оценок bm25 и TF-IDF и не перевешивает заметно лучшее
+    совпадение.
+    """
+    half_life = settings.SEARCH_RECENCY_HALF_LIFE * SECONDS_PER_DAY
+    sql = '(1 + %%s / (%%s - %s(%s, %%s)))' % (_least_sql(), timestamp_sql)
+    return sql, [settings.SEARCH_RECENCY_BOOST * half_life,
+                 half_life + now, now]
+
+
+def use_fts():
+    """Используется ли FTS5: только на SQLite с созданной таблицей."""
+    if settings.SEARCH_BACKEND == 'python' or connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s", [FTS_TABLE])
+            _fts_available[connection.alias] = cursor.fetchone() is not None
+    return _fts_available[connection.alias]
+
+
+class FTSBackend:
+    """Поиск средствами SQLite FTS5.
+
+    Строки индекса: пост с rowid = id поста и комментарии с
+    rowid = -id комментария, поэтому обновление идет по rowid.
+    """
+
+    def _replace(self, rowid, post_id, pub_date, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [rowid])
+            cursor.execute(
+                'INSERT INTO %s (rowid, post_id, pub_ts, body) '
+                'VALUES (%%s, %%s, %%s, %%s)' % FTS_TABLE,
+                [rowid, post_id, _timestamp(pub_date), text])
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [rowid])
+
+    def index_post(self, post):
+        self._replace(post.pk, post.pk, post.pub_date, post.text)
+
+    def remove_post(self, post):
+        self._delete(post.pk)
+
+    def index_comment(self, comment, pub_date):
+        self._replace(-comment.pk, comment.post_id, pub_date, comment.text)
+
+    def remove_comment(self, comment):
+        self._delete(-comment.pk)
+
+    def rebuild(self):
+        """Заполняет индекс одним INSERT ... SELECT на таблицу."""
+        posts = Post._meta.db_table
+        comments = Comment._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % FTS_TABLE)
+            cursor.execute(
+                'INSERT INTO %s (rowid, post_id, pub_ts, body) '
+                "SELECT id, id, CAST(strftime('%%s', pub_date) AS INTEGER), "
+                'text FROM %s' % (FTS_TABLE, posts))
+            cursor.execute(
+                'INSERT INTO %s (rowid, post_id, pub_ts, body) '
+                'SELECT -c.id, c.post_id, '
+                "CAST(strftime('%%s', p.pub_date) AS INTEGER), c.text "
+                'FROM %s c JOIN %s p ON p.id = c.post_id'
+                % (FTS_TABLE, comments, posts))
+
+    def _match(self, terms):
+        return ' '.join('"%s"' % term for term in terms)
+
+    def search(self, terms, after, limit, now, posts_only=False):
+        recency, params = recency_sql('pub_ts', now)
+        params.append(self._match(terms))
+        where = ''
+        if after is not None:
+            where = 'WHERE score < %s OR (score = %s AND post_id < %s)'
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit)
+        sql = (
+            'SELECT post_id, score FROM ('
+            ' SELECT post_id, MAX(-rank * %s) AS score'
+            ' FROM %s WHERE %s MATCH %%s%s GROUP BY post_id'
+            ') %s ORDER BY score DESC, post_id DESC LIMIT %%s'
+            % (recency, FTS_TABLE, FTS_TABLE,
+               ' AND rowid > 0' if posts_only else '', where)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(score, post_id) for post_id, score in cursor.fetchall()]
+
+    def comments(self, terms, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT -rowid FROM %s WHERE %s MATCH %%s AND rowid < 0 '
+                'ORDER BY rowid LIMIT %%s' % (FTS_TABLE, FTS_TABLE),
+                [self._match(terms), limit])
+            return [comment_id for comment_id, in cursor.fetchall()]
+
+
+class PythonBackend:
+    """Обратный индекс в таблице SearchPosting с ранжированием TF-IDF.
+
+    Вес термина в документе (1 + ln частоты) хранится в индексе,
+    поэтому отбор, оценка и сортировка выполняются одним SQL-запросом.
+    """
+
+    def _postings(self, text, post_id, comment_id=None):
+        return [
+            SearchPosting(term=term, post_id=post_id, comment_id=comment_id,
+                          frequency=frequency,
+                          weight=1 + math.log(frequency))
+            for term, frequency in Counter(tokenize(text)).items()
+        ]
+
+    def index_post(self, post):
+        self.remove_post(post)
+        SearchPosting.objects.bulk_create(self._postings(post.text, post.pk))
+
+    def remove_post(self, post):
+        SearchPosting.objects.filter(
+            post_id=post.pk, comment__isnull=True).delete()
+
+    def index_comment(self, comment, pub_date):
+        self.remove_comment(comment)
+        SearchPosting.objects.bulk_create(
+            self._postings(comment.text, comment.post_id, comment.pk))
+
+    def remove_comment(self, comment):
+        SearchPosting.objects.filter(comment_id=comment.pk).delete()
+
+    def rebuild(self):
+        SearchPosting.objects.all().delete()
+        for post in Post.objects.only('text').iterator():
+            SearchPosting.objects.bulk_create(
+                self._postings(post.text, post.pk))
+        for comment in Comment.objects.only('text', 'post').iterator():
+            SearchPosting.objects.bulk_create(
+                self._postings(comment.text, comment.post_id, comment.pk))
+
+    def _idf(self, terms):
+        """IDF терминов: число документов берется из оценки размера
+        таблицы постов, а не из COUNT(*) на каждый запрос.
+        """
+        total = estimated_count(Post.objects.all())
+        if total is None:
+            total = Post.objects.count()
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=terms).order_by()
+            .values('term').annotate(posts=Count('post_id', distinct=True))
+            .values_list('term', 'posts'))
+        return {term: math.log(1 + max(total, 1) / frequencies[term])
+                for term in frequencies}
+
+    def _timestamp_sql(self):
+        if connection.vendor == 'postgresql':
+            return 'EXTRACT(EPOCH FROM p.pub_date)'
+        return "CAST(strftime('%%s', p.pub_date) AS INTEGER)"
+
+    def search(self, terms, after, limit, now, posts_only=False):
+        idf = self._idf(terms)
+        if len(idf) < len(terms):
+            return []
+        cases = ' '.join('WHEN %s THEN %s' for _ in terms)
+        params = [value for term in terms for value in (term, idf[term])]
+        recency, recency_params = recency_sql(self._timestamp_sql(), now)
+        params.extend(recency_params)
+        params.extend(terms)
+        params.append(len(terms))
+        where = ''
+        if after is not None:
+            where = 'WHERE score < %s OR (score = %s AND post_id < %s)'
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit)
+        sql = (
+            'SELECT score, post_id FROM ('
+            ' SELECT s.post_id AS post_id,'
+            ' SUM(s.weight * CASE s.term %s END) * %s AS score'
+            ' FROM %s s JOIN %s p ON p.id = s.post_id'
+            ' WHERE s.term IN (%s)%s'
+            ' GROUP BY s.post_id, p.pub_date'
+            ' HAVING COUNT(DISTINCT s.term) = %%s'
+            ') ranked %s ORDER BY score DESC, post_id DESC LIMIT %%s'
+            % (cases, recency, SearchPosting._meta.db_table,
+               Post._meta.db_table, ', '.join(['%s'] * len(terms)),
+               ' AND s.comment_id IS NULL' if posts_only else '', where)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(score, post_id) for score, post_id in cursor.fetchall()]
+
+    def comments(self, terms, limit):
+        return list(
+            SearchPosting.objects
+            .filter(term__in=terms, comment__isnull=False).order_by()
+            .values('comment_id').annotate(terms=Count('term', distinct=True))
+            .filter(terms=len(terms)).order_by('-comment_id')
+            .values_list('comment_id', flat=True)[:limit])
+
+
+def get_backend():
+    return FTSBackend() if use_fts() else PythonBackend()
+
+
+def search_ids(query, limit, after=None, posts_only=False, now=None):
+    """Пары (оценка, id поста) лучших совпадений после ключа after.
+
+    Свежесть считается на момент now (по умолчанию — текущий), чтобы
+    оценки страниц одного поиска были сравнимы. С posts_only совпадения
+    ищутся только в текстах постов, без комментариев.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    if now is None:
+        now = int(time.time())
+    return get_backend().search(terms, after, limit, now, posts_only)
+
+
+def search_comment_ids(query, limit):
+    """id комментариев со всеми словами запроса, новые первыми."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    return get_backend().comments(terms, limit)
+
+
+def search_posts(query, cursor=None, per_page=10):
+    """Страница результатов поиска по постам и комментариям.
+
+    Посты упорядочены по релевантности с множителем свежести;
+    курсор хранит оценку и id последнего поста страницы и момент, на
+    который считалась свежесть первой страницы.
+    """
+    after = None
+    now = int(time.time())
+    if cursor:
+        try:
+            score, post_id, cursor_now = decode_token(cursor)
+            after = (float(score), int(post_id))
+            now = int(cursor_now)
+        except (InvalidCursor, TypeError, ValueError):
+            cursor = ''
+    rows = search_ids(query, per_page + 1, after, now=now)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_token([*rows[-1], now])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for _, post_id in rows])
+    object_list = [posts[post_id] for _, post_id in rows if post_id in posts]
+    return CursorPage(object_list, None, cursor or '', next_cursor)
@@ -0,0 +1,324 @@
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post
+from .search import get_backend
+from .thumbnails import (THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS,
+                         generate_variants)
+
+User = get_user_model()
+
+BATCH_SIZE = 10000
+SEED_IMAGES_DIR = 'posts/seed'
+SEED_IMAGES = 8
+SENTENCES = 5000
+# Раундов без новых пар, после которых подписки перестают добирать.
+MAX_STALLED_ROUNDS = 100
+SQLITE_CACHE_KB = 1024 * 1024
+WORDS = (
+    'лента пост автор группа подписка комментарий город лето море книга '
+    'кофе утро вечер работа проект код тест релиз кеш база запрос индекс '
+    'картинка фото дорога горы река лес друг идея план вопрос ответ'
+).split()
+
+POST_COLUMNS = ('text', 'pub_date', 'author_id', 'group_id', 'image',
+                'comments_count', 'thumbnail_url', 'image_variants')
+COMMENT_COLUMNS = ('text', 'created', 'author_id', 'post_id')
+FOLLOW_COLUMNS = ('user_id', 'author_id')
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса степенного распределения для random.choices.
+
+    При exponent = 0 распределение равномерное.
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _sentences(rng, count=SENTENCES):
+    """Пул предложений: тексты собираются из них, а не по словам."""
+    return [_text(rng, 4, 15) + '.' for _ in range(count)]
+
+
+def insert_rows(model, columns, rows):
+    """Вставляет готовые кортежи одним подготовленным INSERT.
+
+    В отличие от bulk_create не создает объекты моделей и не собирает
+    SQL для каждой пачки, поэтому быстрее на миллионах строк. Сигналы
+    и значения по умолчанию не применяются.
+    """
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+@contextmanager
+def bulk_load_settings():
+    """Крупный кеш страниц SQLite на время загрузки.
+
+    По умолчанию кеш — около 2 МБ, и при вставке миллионов строк
+    в одной транзакции страницы постоянно вытесняются в журнал.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        cache_size = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size = %d' % -SQLITE_CACHE_KB)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size = %d' % cache_size)
+
+
+def _ids(model, count):
+    """id последних count записей модели в порядке вставки."""
+    ids = model.objects.order_by('-pk').values_list('pk', flat=True)[:count]
+    return list(reversed(ids))
+
+
+def _next_index(model, field, prefix):
+    """Номер, следующий за наибольшим в значениях вида prefix<номер>.
+
+    По числу строк номер считать нельзя: после удаления части записей
+    он совпал бы с уже занятым.
+    """
+    last = model.objects.filter(
+        **{field + '__regex': r'^%s[0-9]+$' % prefix}
+    ).aggregate(last=Max(Cast(
+        Substr(field, len(prefix) + 1), IntegerField())))['last']
+    return 0 if last is None else last + 1
+
+
+def _seed_images(rng):
+    """Небольшой набор картинок, общий для всех постов с картинками.
+
+    Миниатюры и варианты создаются сразу, как после фоновой обработки
+    загрузки. Возвращает тройки (картинка, миниатюра, манифест).
+    """
+    images = []
+    for index in range(SEED_IMAGES):
+        name = '%s/seed-%s.png' % (SEED_IMAGES_DIR, index)
+        if not default_storage.exists(name):
+            buffer = BytesIO()
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 540), color).save(buffer, 'PNG')
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        image = Post(image=name).image
+        thumbnail = get_thumbnail(
+            image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+        images.append((name, thumbnail.url, generate_variants(image)))
+    return images
+
+
+class Seeder:
+    """Генератор данных с заданными распределениями.
+
+    Все случайные величины берутся из одного random.Random(random_seed),
+    поэтому при одинаковых параметрах данные совпадают (кроме дат,
+    которые отсчитываются от текущего часа).
+    """
+
+    def __init__(self, users, posts, groups=None, comments=None,
+                 follows=None, author_skew=1.1, follower_skew=1.2,
+                 group_skew=1.0, comment_skew=1.0, group_share=0.6,
+                 image_share=0.1, days=365, random_seed=0,
+                 batch_size=BATCH_SIZE, timelines=True, search_index=True):
+        self.users = users
+        self.posts = posts
+        self.groups = max(1, users // 100) if groups is None else groups
+        self.comments = posts // 2 if comments is None else comments
+        self.follows = users * 10 if follows is None else follows
+        self.author_skew = author_skew
+        self.follower_skew = follower_skew
+        self.group_skew = group_skew
+        self.comment_skew = comment_skew
+        self.group_share = group_share
+        self.image_share = image_share
+        self.batch_size = batch_size
+        self.timelines = timelines
+        self.search_index = search_index
+        self.rng = random.Random(random_seed)
+        self.sentences = _sentences(self.rng)
+        end = timezone.now().replace(minute=0, second=0, microsecond=0)
+        if timezone.is_aware(end):
+            end = timezone.make_naive(end, connection.timezone)
+        self.end = end
+        self.span = days * 24 * 60 * 60
+
+    def _texts(self, count, low, high):
+        choices, randint = self.rng.choices, self.rng.randint
+        sentences = self.sentences
+        return [
+            ' '.join(choices(sentences, k=randint(low, high)))
+            for _ in range(count)
+        ]
+
+    def _offsets(self, count):
+        """Сдвиги дат в секундах по убыванию: записи вставляются
+        в хронологическом порядке, как в рабочей базе, и индексы по дате
+        растут с конца.
+        """
+        randrange = self.rng.randrange
+        return sorted((randrange(self.span) for _ in range(count)),
+                      reverse=True)
+
+    def _dates(self, offsets):
+        """Наивные даты во временной зоне соединения, строкой — так их
+        готовит adapt_datetimefield_value.
+        """
+        end = self.end
+        return [str(end - timedelta(seconds=offset)) for offset in offsets]
+
+    def create_users(self):
+        first = _next_index(User, 'username', 'seed')
+        for start in range(first, first + self.users, self.batch_size):
+            stop = min(start + self.batch_size, first + self.users)
+            User.objects.bulk_create(
+                User(username='seed%s' % index, first_name='Автор',
+                     last_name=str(index), password='!')
+                for index in range(start, stop)
+            )
+        return _ids(User, self.users)
+
+    def create_groups(self):
+        start = _next_index(Group, 'slug', 'seed-group-')
+        Group.objects.bulk_create(
+            Group(title='Группа %s' % index, slug='seed-group-%s' % index,
+                  description=_text(self.rng, 5, 20))
+            for index in range(start, start + self.groups)
+        )
+        return _ids(Group, self.groups)
+
+    def create_posts(self, user_ids, group_ids):
+        rng = self.rng
+        author_weights = zipf_weights(len(user_ids), self.author_skew)
+        group_weights = zipf_weights(len(group_ids), self.group_skew)
+        images = _seed_images(rng) if self.image_share else []
+        no_image = ('', '', '')
+        offsets = self.post_offsets = self._offsets(self.posts)
+        for start in range(0, self.posts, self.batch_size):
+            dates = self._dates(offsets[start:start + self.batch_size])
+            size = len(dates)
+            texts = self._texts(size, 1, 5)
+            authors = rng.choices(user_ids, cum_weights=author_weights, k=size)
+            groups = (
+                rng.choices(group_ids, cum_weights=group_weights, k=size)
+                if group_ids else [None] * size)
+            rows = []
+            for text, date, author_id, group_id in zip(
+                    texts, dates, authors, groups):
+                if rng.random() >= self.group_share:
+                    group_id = None
+                image, thumbnail_url, variants = (
+                    rng.choice(images)
+                    if images and rng.random() < self.image_share
+                    else no_image)
+                rows.append((text, date, author_id, group_id,
+                             image, 0, thumbnail_url, variants))
+            insert_rows(Post, POST_COLUMNS, rows)
+        return _ids(Post, self.posts)
+
+    def create_follows(self, user_ids):
+        """Подписки: читатели равновероятны, авторы — по популярности."""
+        rng = self.rng
+        popular = user_ids[:]
+        rng.shuffle(popular)
+        weights = zipf_weights(len(popular), self.follower_skew)
+        target = min(self.follows, len(user_ids) * (len(user_ids) - 1))
+        pairs = set()
+        stalled = 0
+        while len(pairs) < target and stalled < MAX_STALLED_ROUNDS:
+            size = target - len(pairs)
+            readers = rng.choices(user_ids, k=size)
+            authors = rng.choices(popular, cum_weights=weights, k=size)
+            before = len(pairs)
+            pairs.update(
+                pair for pair in zip(readers, authors) if pair[0] != pair[1])
+            stalled = 0 if len(pairs) > before else stalled + 1
+        pairs = sorted(pairs)
+        for start in range(0, len(pairs), self.batch_size):
+            insert_rows(
+                Follow, FOLLOW_COLUMNS, pairs[start:start + self.batch_size])
+        return len(pairs)
+
+    def create_comments(self, user_ids, post_ids):
+        """Комментарии: посты по популярности, дата каждого — между
+        публикацией поста и концом периода.
+        """
+        rng = self.rng
+        weights = zipf_weights(len(post_ids), self.comment_skew)
+        posts = rng.choices(range(len(post_ids)), cum_weights=weights,
+                            k=self.comments)
+        randrange = rng.randrange
+        # Сдвиг комментария меньше сдвига поста: комментарий позже.
+        comments = sorted(
+            ((randrange(max(self.post_offsets[post], 1)), post_ids[post])
+             for post in posts),
+            reverse=True)
+        for start in range(0, self.comments, self.batch_size):
+            batch = comments[start:start + self.batch_size]
+            size = len(batch)
+            insert_rows(Comment, COMMENT_COLUMNS, list(zip(
+                self._texts(size, 1, 2),
+                self._dates([offset for offset, _ in batch]),
+                rng.choices(user_ids, k=size),
+                [post_id for _, post_id in batch],
+            )))
+
+    def run(self):
+        """Создает данные и пересобирает производные: счетчики, ленты
+        и поисковый индекс (последние два можно отключить и собрать
+        позже). Возвращает число созданных записей.
+        """
+        with bulk_load_settings(), transaction.atomic():
+            user_ids = self.create_users()
+            group_ids = self.create_groups()
+            post_ids = self.create_posts(user_ids, group_ids)
+            follows = self.create_follows(user_ids)
+            if not post_ids:
+                self.comments = 0
+            self.create_comments(user_ids, post_ids)
+            counters.reconcile()
+            if self.timelines:
+                timeline.rebuild_all()
+            if self.search_index:
+                get_backend().rebuild()
+        return {
+            'users': self.users,
+            'groups': self.groups,
+            'posts': self.posts,
+            'follows': follows,
+            'comments': self.comments,
+        }
+
+
+def seed(users, posts, **options):
+    """Заполняет базу данными; параметры распределений — см. Seeder."""
+    return Seeder(users, posts, **options).run()
@@ -0,0 +1,188 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed_cache, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся на страницах лент и постов.
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_group_slug = None
+    instance._previous_image = None
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'group__slug', 'image', 'image_variants').first()
+        if previous is not None:
+            instance._previous_group_id = previous[0]
+            instance._previous_group_slug = previous[1]
+            instance._previous_image = previous[2:]
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stat(instance.author_id, 'posts_count', 1)
+        counters.change_group_posts(instance.group_id, 1)
+    elif instance._previous_group_id != instance.group_id:
+        counters.change_group_posts(instance._previous_group_id, -1)
+        counters.change_group_posts(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_stat(instance.author_id, 'posts_count', -1)
+    counters.change_group_posts(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stat(instance.author_id, 'followers_count', 1)
+        counters.change_user_stat(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user_stat(instance.author_id, 'followers_count', -1)
+    counters.change_user_stat(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_posts(sender, instance, created, **kwargs):
+    if created:
+        timeline.add_author(instance.user_id, instance.author_id)
+        timeline.followers_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_unfollowed_posts(sender, instance, **kwargs):
+    timeline.remove_author(instance.user_id, instance.author_id)
+    timeline.followers_changed(instance.author_id, -1)
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id is not None else None
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, **kwargs):
+    feed_cache.bump_post_feeds(
+        instance.author.username, _group_slug(instance),
+        getattr(instance, '_previous_group_slug', None), post_id=instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    feed_cache.bump_post_feeds(
+        instance.author.username, _group_slug(instance), post_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def delete_replaced_image_files(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous[0] and previous[0] != instance.image.name:
+        thumbnails.delete_image_files.delay(*previous)
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_image_files(sender, instance, **kwargs):
+    if instance.image:
+        thumbnails.delete_image_files.delay(
+            instance.image.name, instance.image_variants)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author__username', 'group__slug').first()
+    if post is not None:
+        feed_cache.bump_post_feeds(*post, post_id=instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follows(sender, instance, **kwargs):
+    feed_cache.bump_version(feed_cache.follows_scope(instance.user_id))
+
+
+@receiver(pre_save, sender=User)
+def remember_user_name(sender, instance, update_fields, **kwargs):
+    instance._previous_name = None
+    if update_fields and not set(update_fields) & set(AUTHOR_NAME_FIELDS):
+        instance._previous_name = tuple(
+            getattr(instance, field) for field in AUTHOR_NAME_FIELDS)
+    elif instance.pk:
+        instance._previous_name = User.objects.filter(
+            pk=instance.pk).values_list(*AUTHOR_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_feeds(sender, instance, created, **kwargs):
+    """Страницы зависят только от имени автора: вход, смена пароля
+    и новый пользователь без постов их не меняют.
+    """
+    name = tuple(getattr(instance, field) for field in AUTHOR_NAME_FIELDS)
+    if not created and name != instance._previous_name:
+        usernames = {instance.username}
+        if instance._previous_name:
+            usernames.add(instance._previous_name[0])
+        feed_cache.bump_author_feeds(instance.pk, *usernames)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_profile(sender, instance, **kwargs):
+    """Профиль берется из кеша без запроса к базе: его страницы нужно
+    сбросить, даже если у пользователя не было постов.
+    """
+    feed_cache.bump_version(feed_cache.profile_scope(instance.username))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    feed_cache.bump_version(feed_cache.GROUPS_SCOPE)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search.get_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.get_backend().remove_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, **kwargs):
+    search.get_backend().index_comment(instance, instance.post.pub_date)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.get_backend().remove_comment(instance)
@@ -0,0 +1,29 @@
+from django import template
+
+from posts.models import Follow
+from posts.paginators import CursorPage, page_window
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, username):
+    """Подписан ли текущий пользователь на автора username."""
+    user = context['user']
+    return user.is_authenticated and Follow.objects.filter(
+        user=user, author__username=username).exists()
+
+
+@register.inclusion_tag('posts/includes/paginator.html')
+def pagination(page_obj):
+    """Навигация по ленте: окно номеров страниц или курсоры.
+
+    Размер разметки не зависит от числа страниц (см. page_window).
+    """
+    if isinstance(page_obj, CursorPage):
+        return {'page_obj': page_obj, 'cursor': True}
+    return {
+        'page_obj': page_obj,
+        'cursor': False,
+        'pages': page_window(page_obj.number, page_obj.paginator.num_pages),
+    }
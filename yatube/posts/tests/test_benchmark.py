@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import benchmark, urls
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+from ..seeding import seed
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True,
+                   RATE_LIMIT_ENABLED=False)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rows = seed(users=20, posts=200, follows=60, image_share=0.2)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_builds_derived_data(self):
+        """После загрузки пересчитаны счетчики и собраны ленты."""
+        self.assertEqual(Post.objects.count(), self.rows['posts'])
+        self.assertEqual(Follow.objects.count(), self.rows['follows'])
+        self.assertEqual(Comment.objects.count(), self.rows['comments'])
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            self.rows['posts'])
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(thumbnail_url='').exists())
+
+    def test_all_urls_measured(self):
+        """Замеряются все адреса posts.urls, ни один не падает."""
+        results = benchmark.run_urls(iterations=2)
+        names = {'posts:' + pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(set(results), names)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 400)
+                for mode in ('cold', 'warm'):
+                    self.assertEqual(
+                        set(result[mode]),
+                        {'p50', 'p90', 'p99', 'mean', 'max', 'queries'})
+                self.assertGreater(result['memory_peak_kb'], 0)
+
+    def test_throughput(self):
+        """Пропускная способность WSGI и ASGI без ошибок."""
+        path = reverse('about:author')
+        for measure in (benchmark.wsgi_throughput, benchmark.asgi_throughput):
+            with self.subTest(measure=measure.__name__):
+                result = measure(path, concurrency=4, requests=12)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['requests_per_second'], 0)
+
+    def test_template_render(self):
+        """Время шаблонов гостевых страниц без cached loader и с ним."""
+        results = benchmark.run_template_render(iterations=1)
+        self.assertIn('posts:index', results)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                for mode in ('uncached', 'cached'):
+                    self.assertGreater(result[mode]['max'], 0)
+
+    def test_admin_changelists(self):
+        """Списки админки, фильтр по дате и поиск отвечают 200."""
+        results = benchmark.run_admin_changelists(iterations=1)
+        self.assertEqual(set(results), set(benchmark.admin_changelists()))
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['status'], 200)
+                self.assertGreater(result['max'], 0)
+
+    def test_compare_reports_regressions(self):
+        """Рост p90 сверх порога и рост числа запросов — регрессии."""
+        def result(p90, queries):
+            timing = {'p90': p90, 'queries': queries}
+            return {'datasets': {'small': {'urls': {
+                'posts:index': {'cold': timing, 'warm': timing},
+            }}}}
+
+        self.assertEqual(
+            benchmark.compare(result(10, 2), result(11, 2)), [])
+        self.assertEqual(
+            len(benchmark.compare(result(10, 2), result(13, 3))), 4)
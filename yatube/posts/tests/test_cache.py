@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.instrumentation import stats
+from ..models import Group, Post
+from ..paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class CacheWarmupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='warmup')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='warmup',
+            description='Тестовое описание',
+        )
+        for index in range(15):
+            Post.objects.create(
+                text='Текст' + str(index), author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_warmup_cache_command(self):
+        """После прогрева первые страницы лент отдаются без запросов."""
+        call_command('warmup_cache', pages=2, stdout=StringIO())
+        cursor = CursorPaginator(Post.objects.all(), 10).page().next_cursor
+        for data in ({}, {'cursor': cursor}):
+            with self.subTest(data=data):
+                with self.assertNumQueries(0):
+                    self.guest_client.get(reverse('posts:index'), data)
+        group_url = reverse('posts:group_list', kwargs={'slug': 'warmup'})
+        with self.assertNumQueries(0):
+            self.guest_client.get(group_url)
+
+    def test_warmup_goes_through_middleware(self):
+        """Прогрев проходит через middleware, как запросы посетителей."""
+        stats.reset()
+        call_command('warmup_cache', pages=2, stdout=StringIO())
+        views = stats.snapshot()['views']
+        self.assertEqual(views['posts:index']['requests'], 2)
+        self.assertEqual(views['posts:group_list']['requests'], 2)
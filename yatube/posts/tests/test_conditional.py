@@ -0,0 +1,265 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    """ETag, 304 Not Modified и Cache-Control страниц лент и поста."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='conditional',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_not_modified(self):
+        """Неизмененная страница отдается как 304 без шаблонов и страницы
+        ленты.
+        """
+        queries = {
+            reverse('posts:index'): 0,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 0,
+            reverse('posts:profile', kwargs={'username': self.author}): 0,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 1,
+        }
+        for url, count in queries.items():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(count):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                self.assertIn('max-age=60', response['Cache-Control'])
+
+    def test_changes_update_etag(self):
+        """Новый пост и комментарий меняют ETag всех затронутых страниц."""
+        etags = {url: self.guest_client.get(url)['ETag']
+                 for url in self.urls()}
+        Comment.objects.create(
+            text='Комментарий', author=self.reader, post=self.post)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_user(self):
+        """У гостя и вошедшего пользователя разные ETag, подписка меняет
+        ETag профиля.
+        """
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        guest_etag = self.guest_client.get(url)['ETag']
+        etag = self.authorized_client.get(url)['ETag']
+        self.assertNotEqual(etag, guest_etag)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Отписаться')
+
+    def test_cache_control(self):
+        """Гостям — public с max-age, вошедшим — private с перепроверкой."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                guest = self.revalidate(self.guest_client, url)
+                self.assertIn('public', guest['Cache-Control'])
+                self.assertIn('max-age=60', guest['Cache-Control'])
+                user = self.authorized_client.get(url)
+                self.assertIn('private', user['Cache-Control'])
+                self.assertIn('no-cache', user['Cache-Control'])
+
+    def test_guest_post_detail_without_csrf_cookie(self):
+        """Гостевая страница поста без формы и CSRF-cookie: ее можно
+        хранить в общем кеше.
+        """
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_missing_object_not_found(self):
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class PageCacheTests(TestCase):
+    """Кеш страниц: гостям целиком, вошедшим — каркас с дырками."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='page-cache',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def login(self, username):
+        client = Client()
+        client.force_login(User.objects.create_user(username=username))
+        return client
+
+    def test_guest_page_served_from_cache(self):
+        """Повторная гостевая страница не рендерит шаблоны."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+
+    def test_unknown_params_share_cache_entry(self):
+        """Посторонние параметры запроса не создают новых записей кеша
+        и ETag; page и cursor — создают.
+        """
+        url = reverse('posts:index')
+        first = self.guest_client.get(url, {'utm_source': 'a'})
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url, {'utm_source': 'b'})
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, first.content)
+        paged = self.guest_client.get(url, {'page': '1', 'utm_source': 'a'})
+        self.assertNotEqual(paged['ETag'], first['ETag'])
+
+    def test_guest_group_and_profile_served_from_cache(self):
+        """Повторные гостевые страницы группы и профиля не обращаются
+        к базе.
+        """
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.content, first.content)
+
+    def test_renamed_and_deleted_users_leave_profile_cache(self):
+        """Профиль по прежнему имени и профиль удаленного пользователя
+        больше не отдаются из кеша.
+        """
+        old = reverse('posts:profile', kwargs={'username': self.author})
+        reader = User.objects.create_user(username='reader')
+        profile = reverse('posts:profile', kwargs={'username': reader})
+        for url in (old, profile):
+            self.guest_client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.save()
+        reader.delete()
+        for url in (old, profile):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'renamed'}))
+        self.assertContains(response, 'Текст')
+
+    def test_users_share_skeleton_with_own_holes(self):
+        """Вошедшие пользователи получают свою шапку, кнопку подписки
+        и форму комментария на общем каркасе.
+        """
+        first = self.login('first')
+        second = self.login('second')
+        Follow.objects.create(
+            user=User.objects.get(username='first'), author=self.author)
+        profile = reverse('posts:profile', kwargs={'username': self.author})
+        self.assertContains(first.get(profile), 'Пользователь: first')
+        response = second.get(profile)
+        self.assertIsNone(response.context.get('page_obj'))
+        self.assertContains(response, 'Пользователь: second')
+        self.assertContains(response, 'Подписаться')
+        self.assertNotContains(response, '<!--hole:')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        first.get(detail)
+        response = second.get(detail)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertEqual(response.cookies['csrftoken'].value,
+                         second.cookies['csrftoken'].value)
+        self.assertContains(self.guest_client.get(detail), 'Войти')
+
+    def test_changes_invalidate_pages(self):
+        """Посты, комментарии и группы сбрасывают закешированные страницы."""
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for url in (index, group, detail):
+            self.guest_client.get(url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertContains(self.guest_client.get(index), 'Новый пост')
+        Comment.objects.create(
+            text='Новый комментарий', author=self.author, post=self.post)
+        self.assertContains(
+            self.guest_client.get(detail), 'Новый комментарий')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.guest_client.get(group), 'Новое название')
+
+    def test_user_changes_invalidate_only_author_pages(self):
+        """Новый пользователь и смена пароля не сбрасывают страницы,
+        смена имени автора сбрасывает страницы с его постами.
+        """
+        index = reverse('posts:index')
+        etag = self.guest_client.get(index)['ETag']
+        User.objects.create_user(username='newcomer')
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('new-password')
+        author.save()
+        self.assertEqual(
+            self.guest_client.get(index, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED)
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        for url in (index, detail, group):
+            self.guest_client.get(url)
+        author.username = 'renamed'
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        self.assertContains(self.guest_client.get(index), 'renamed')
+        for url in (detail, group):
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новое Имя')
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import CursorPaginator
+from ..timeline import follow_entries
+from ..utils import feed_queryset
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент используют индексы и не сортируют во временном B-дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='plans')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='plans',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_feed_queries_use_indexes(self):
+        """Ни один запрос ленты не строит временное B-дерево."""
+        keyset = CursorPaginator(Post.objects.all(), 10)._keyset_q(
+            [timezone.now(), 100], reverse=False)
+        queries = {
+            'index': feed_queryset(),
+            'group': feed_queryset(self.group.posts.all()),
+            'profile': feed_queryset(Post.objects.filter(author=self.user)),
+            'follow': follow_entries(self.user),
+            'cursor': feed_queryset().filter(keyset),
+            'group_cursor': feed_queryset(
+                self.group.posts.all()).filter(keyset),
+            'comments': Comment.objects.filter(
+                post_id=1).select_related('author'),
+            'followers': Follow.objects.filter(
+                author=self.user).values_list('user_id'),
+            'admin_posts_by_date': Post.objects.filter(
+                pub_date__gte=timezone.now()),
+            'admin_comments_by_date': Comment.objects.filter(
+                created__gte=timezone.now()),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                plan = self.plan(queryset[:10])
+                self.assertNotIn('TEMP B-TREE', plan)
+                self.assertNotRegex(
+                    plan, r'SCAN (TABLE )?posts_\w+( |$)(?!USING)')
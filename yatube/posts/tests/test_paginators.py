@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginators import (CursorPage, CursorPaginator,
+                          EstimatedCountPaginator, estimated_count,
+                          page_window)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cursor',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(text='Текст' + str(index), author=cls.user, group=cls.group)
+            for index in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_cursor_walks_feed_in_order(self):
+        """Проход по курсорам выдает все посты в порядке ленты."""
+        seen = []
+        page = self.paginator.page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = self.paginator.page(page.next_cursor)
+        expected = list(Post.objects.values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу."""
+        first = self.paginator.page()
+        second = self.paginator.page(first.next_cursor)
+        back = self.paginator.page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_page_costs_single_query(self):
+        """Любая страница строится одним запросом без COUNT(*)."""
+        first = self.paginator.page()
+        cursor = self.paginator.page(first.next_cursor).next_cursor
+        with self.assertNumQueries(1):
+            page = self.paginator.page(cursor)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Битый курсор приводит к первой странице."""
+        page = self.paginator.get_page('не-курсор')
+        self.assertEqual(list(page), list(self.paginator.page()))
+
+    def test_feed_views_accept_cursor(self):
+        """Ленты принимают параметр cursor."""
+        client = Client()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = client.get(url + '?cursor=')
+                page_obj = response.context['page_obj']
+                self.assertIsInstance(page_obj, CursorPage)
+                self.assertEqual(len(page_obj), 10)
+                self.assertContains(response, page_obj.next_cursor)
+
+
+class PageWindowTests(SimpleTestCase):
+    template = Template('{% load posts_tags %}{% pagination page_obj %}')
+
+    def render(self, pages, number):
+        page = Paginator(range(pages * 10), 10).page(number)
+        return self.template.render(Context({'page_obj': page}))
+
+    def test_page_window(self):
+        """Первая, последняя, соседние страницы и пропуски."""
+        cases = {
+            (1, 1): [1],
+            (1, 10): [1, 2, 3, None, 10],
+            (5, 10): [1, 2, 3, 4, 5, 6, 7, None, 10],
+            (50, 100): [1, None, 48, 49, 50, 51, 52, None, 100],
+            (100, 100): [1, None, 98, 99, 100],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(page_window(number, num_pages), expected)
+
+    def test_output_size_fixed(self):
+        """Размер навигации не растет с числом страниц."""
+        small = self.render(1000, 500)
+        large = self.render(100000, 50000)
+        self.assertEqual(small.count('<li'), large.count('<li'))
+        self.assertEqual(small.count('<li'), 4 + 9)
+        self.assertLess(len(large) - len(small), 100)
+        self.assertLess(len(large), 3000)
+
+    def test_current_page_and_ellipsis(self):
+        html = self.render(100, 50)
+        self.assertIn('<span class="page-link">50</span>', html)
+        self.assertIn('href="?page=100"', html)
+        self.assertEqual(html.count('&hellip;'), 2)
+        self.assertNotIn('href="?page=47"', html)
+
+
+class EstimatedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='estimated')
+        cls.posts = [Post.objects.create(text='Текст', author=author)
+                     for _ in range(5)]
+
+    def test_estimate_only_for_whole_table(self):
+        """Оценка берется для всей таблицы, выборки считаются точно."""
+        self.posts[2].delete()
+        estimate = estimated_count(Post.objects.all(), threshold=1)
+        if estimate is None:
+            self.skipTest('Оценки нет для этой базы')
+        self.assertGreaterEqual(estimate, 4)
+        self.assertIsNone(estimated_count(Post.objects.all(), threshold=100))
+        self.assertIsNone(estimated_count(
+            Post.objects.filter(pk=self.posts[0].pk), threshold=1))
+
+    def test_small_table_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
@@ -0,0 +1,200 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..utils import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class FeedQueriesTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='queries',
+            description='Тестовое описание',
+        )
+        for index in range(12):
+            author = User.objects.create_user(
+                username='author' + str(index), first_name='Имя')
+            group = Group.objects.create(
+                title='Группа' + str(index),
+                slug='group' + str(index),
+                description='Тестовое описание',
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(text='Текст', author=author, group=group)
+            Post.objects.create(text='Текст', author=author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_guest_feed_queries(self):
+        """Ленты для гостя: фиксированное число запросов на страницу,
+        без COUNT(*) — страницы листаются курсором.
+        """
+        author = User.objects.get(username='author0')
+        pages = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', kwargs={'slug': 'queries'}): 2,
+            reverse('posts:profile', kwargs={'username': author}): 2,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = self.guest_client.get(url)
+                page = response.context['page_obj']
+                if not page.has_next():
+                    continue
+                self.assertContains(
+                    response, '?cursor=%s' % page.next_cursor)
+                with self.assertNumQueries(queries):
+                    self.guest_client.get(url, {'cursor': page.next_cursor})
+
+    def test_follow_index_queries(self):
+        """Лента подписок: фиксированное число запросов на страницу,
+        без COUNT(*) — страницы листаются курсором.
+        """
+        url = reverse('posts:follow_index')
+        # Сессия и пользователь загружаются в кеш первым запросом.
+        first = self.authorized_client.get(url).context['page_obj']
+        for data in ({}, {'cursor': first.next_cursor}):
+            with self.subTest(data=data):
+                # авторы без fan-out, страница
+                with self.assertNumQueries(2):
+                    response = self.authorized_client.get(url, data)
+        second = response.context['page_obj']
+        self.assertEqual(len(second), 10)
+        self.assertTrue(set(first).isdisjoint(second))
+
+    def test_authenticated_index_queries(self):
+        """Сессия и пользователь берутся из кеша: главная страница для
+        вошедшего пользователя не обращается к базе.
+        """
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+        # Страница не в кеше: только COUNT и посты страницы.
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(url, {'page': '2'})
+        self.assertContains(response, 'Пользователь: reader')
+
+
+class CommentPagesTests(TestCase):
+    """Комментарии поста подгружаются страницами по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.small = Post.objects.create(text='Текст', author=cls.author)
+        cls.large = Post.objects.create(text='Текст', author=cls.author)
+        for post, count in ((cls.small, 5), (cls.large, 45)):
+            Comment.objects.bulk_create(
+                Comment(text='Комментарий %s' % index, author=cls.author,
+                        post=post)
+                for index in range(count)
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_cost_fixed(self):
+        """Страница поста стоит одинаково при любом числе комментариев."""
+        for post in (self.small, self.large):
+            with self.subTest(post=post.pk):
+                url = reverse('posts:post_detail', args=(post.pk,))
+                # пост с автором, первая страница комментариев
+                with self.assertNumQueries(2):
+                    response = self.guest_client.get(url)
+                self.assertLessEqual(
+                    len(response.context['comments']), COMMENTS_PER_PAGE)
+
+    def test_fragments_load_all_comments_in_order(self):
+        """Фрагменты по курсору выдают все комментарии в порядке Meta."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=(self.large.pk,)))
+        page = response.context['comments']
+        seen = [comment.pk for comment in page]
+        while page.has_next():
+            response = self.guest_client.get(
+                reverse('posts:post_comments', args=(self.large.pk,)),
+                {'cursor': page.next_cursor})
+            page = response.context['comments']
+            self.assertEqual(
+                'data-more-comments' in response.content.decode(),
+                page.has_next())
+            seen.extend(comment.pk for comment in page)
+        self.assertEqual(
+            seen, list(self.large.comments.values_list('pk', flat=True)))
+
+    def test_fragment_with_bad_cursor(self):
+        """Фрагмент с битым курсором — 400, а не первая страница."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=(self.large.pk,)),
+            {'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class AdminChangelistTests(TestCase):
+    """Число запросов списков админки не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for index in range(count):
+            author = User.objects.create_user(
+                username='admin-author%s' % Post.objects.count())
+            group = Group.objects.create(
+                title='Группа', slug='admin-group%s' % author.pk)
+            post = Post.objects.create(
+                text='Текст', author=author, group=group)
+            Comment.objects.create(text='Текст', author=author, post=post)
+            Follow.objects.create(user=self.admin, author=author)
+
+    def queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_fixed(self):
+        urls = [reverse('admin:posts_%s_changelist' % name)
+                for name in ('post', 'comment', 'follow')]
+        self.add_rows(2)
+        few = [self.queries(url) for url in urls]
+        self.add_rows(20)
+        self.assertEqual([self.queries(url) for url in urls], few)
+
+    def test_group_column_without_select(self):
+        """Группа в списке постов редактируется полем id, без <select>
+        со всеми группами.
+        """
+        self.add_rows(3)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'vForeignKeyRawIdAdminField', count=3)
+        self.assertNotContains(response, '<select name="form-0-group"')
@@ -0,0 +1,184 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib import admin
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db.migrations.executor import MigrationExecutor
+from django.db import connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.tests import attach_sqlite, detach_sqlite
+
+from ..admin import IndexSearchAdmin, PostAdmin
+from ..models import Comment, Post, SearchPosting
+from ..search import search_posts, use_fts
+
+User = get_user_model()
+
+
+class SearchTestsMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='search')
+        cls.post = Post.objects.create(
+            text='Кошки любят рыбу', author=cls.user)
+        cls.other = Post.objects.create(
+            text='Собаки любят кости', author=cls.user)
+
+    def found(self, query):
+        return list(search_posts(query))
+
+    def test_search_by_post_text(self):
+        """Поиск находит пост по словам из текста."""
+        self.assertEqual(self.found('кошки'), [self.post])
+        self.assertEqual(self.found('ЛЮБЯТ рыбу'), [self.post])
+        self.assertEqual(self.found('кошки кости'), [])
+
+    def test_search_by_comment_text(self):
+        """Поиск находит пост по тексту комментария."""
+        Comment.objects.create(
+            text='Отличная овчарка', author=self.user, post=self.other)
+        self.assertEqual(self.found('овчарка'), [self.other])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Кошки любят молоко'
+        post.save()
+        self.assertEqual(self.found('рыбу'), [])
+        self.assertEqual(self.found('молоко'), [post])
+        post.delete()
+        self.assertEqual(self.found('молоко'), [])
+
+    def test_relevance_and_recency(self):
+        """Более релевантный пост выше даже более новых, при равной
+        релевантности выше новый.
+        """
+        for index in range(10):
+            Post.objects.create(text='Другой пост %s' % index,
+                                author=self.user)
+        strong = Post.objects.create(
+            text='любят любят любят любят', author=self.user)
+        strong.pub_date = self.post.pub_date - timedelta(days=2)
+        strong.save()
+        results = self.found('любят')
+        self.assertEqual(results[0], strong)
+        self.assertEqual(results[1:], [self.other, self.post])
+
+    def test_strong_old_match_beats_weak_new(self):
+        """Свежесть не перевешивает заметно лучшее совпадение даже
+        у поста полугодовой давности.
+        """
+        strong = Post.objects.create(
+            text='Рецепт ухи: рыбу рыбу рыбу', author=self.user)
+        strong.pub_date -= timedelta(days=180)
+        strong.save()
+        weak = Post.objects.create(
+            text='Сегодня в парке гуляли дети, шел дождь, а вечером мы '
+                 'пили чай с вареньем и вспоминали рыбу', author=self.user)
+        results = self.found('рыбу')
+        self.assertLess(results.index(strong), results.index(weak))
+
+    def test_cursor_pagination(self):
+        """Курсор проходит все результаты без повторов."""
+        for index in range(12):
+            Post.objects.create(text='Пост про чай ' + str(index),
+                                author=self.user)
+        first = search_posts('чай', per_page=5)
+        seen = list(first)
+        page = first
+        while page.has_next():
+            page = search_posts('чай', page.next_cursor, per_page=5)
+            seen.extend(page)
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(post.pk for post in seen)), 12)
+
+    def test_search_view(self):
+        """Страница /search/ выводит найденные посты."""
+        response = Client().get(reverse('posts:search'), {'q': 'рыбу'})
+        self.assertContains(response, 'Кошки любят рыбу')
+        self.assertNotContains(response, 'Собаки любят кости')
+
+    def admin_results(self, model, query):
+        admin = User.objects.create_superuser(
+            'admin%s' % User.objects.count(), 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_%s_changelist' % model), {'q': query})
+        return response, list(response.context['cl'].result_list)
+
+    def test_admin_search(self):
+        """Админка ищет посты только по их тексту, комментарии — по
+        индексу комментариев.
+        """
+        comment = Comment.objects.create(
+            text='Кошки во дворе', author=self.user, post=self.other)
+        _, posts = self.admin_results('post', 'кошки')
+        self.assertEqual(posts, [self.post])
+        _, comments = self.admin_results('comment', 'кошки')
+        self.assertEqual(comments, [comment])
+
+    def test_admin_search_limit_shown(self):
+        with mock.patch.object(PostAdmin, 'search_results_limit', 1):
+            response, posts = self.admin_results('post', 'любят')
+        self.assertEqual(len(posts), 1)
+        self.assertContains(response, 'Показаны только первые 1 совпадений')
+
+
+class FTSSearchTests(SearchTestsMixin, TestCase):
+    def setUp(self):
+        if not use_fts():
+            self.skipTest('SQLite собран без FTS5')
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(SearchTestsMixin, TestCase):
+    pass
+
+
+class IndexSearchAdminTests(SimpleTestCase):
+    def test_search_index_required(self):
+        """Админка без функции search_index не создается."""
+        with self.assertRaises(ImproperlyConfigured):
+            IndexSearchAdmin(Post, admin.site)
+
+
+@override_settings(SEARCH_BACKEND='python')
+class SearchMigrationTests(SimpleTestCase):
+    """Миграция 0015 заполняет обратный индекс для существующих постов."""
+
+    databases = {'search'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = attach_sqlite('search')
+        call_command('migrate', 'posts', '0014', database='search',
+                     verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        detach_sqlite('search', cls.directory)
+
+    def test_existing_posts_indexed(self):
+        apps = MigrationExecutor(connections['search']).loader.project_state(
+            ('posts', '0014_post_image_variants')).apps
+        author = apps.get_model('auth', 'User').objects.using(
+            'search').create(username='author')
+        post = apps.get_model('posts', 'Post').objects.using(
+            'search').create(text='Кошки любят рыбу', author=author)
+        comment = apps.get_model('posts', 'Comment').objects.using(
+            'search').create(text='Овчарка', author=author, post=post)
+        call_command('migrate', 'posts', database='search', verbosity=0)
+        postings = SearchPosting.objects.using('search')
+        self.assertEqual(
+            set(postings.values_list('term', 'post_id', 'comment_id')),
+            {('кошки', post.pk, None), ('любят', post.pk, None),
+             ('рыбу', post.pk, None), ('овчарка', post.pk, comment.pk)})
+        self.assertEqual(
+            set(postings.values_list('weight', flat=True)), {1})
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_VARIANT_FORMATS=())
+class SeedCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        options = {'users': 30, 'posts': 120, 'image_share': 0,
+                   'stdout': StringIO(), **options}
+        call_command('seed', **options)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'group__slug', 'image')),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username')),
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'author__username', 'post__text')),
+        )
+
+    def clear(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_seed_creates_rows(self):
+        """Команда создает заданное число записей."""
+        self.seed(groups=4, comments=50, follows=40)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_comments_after_posts(self):
+        """Комментарий не бывает раньше своего поста."""
+        self.seed(comments=200)
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists())
+
+    def test_seed_after_deleted_users(self):
+        """Повторный запуск нумерует пользователей после наибольшего
+        номера, а не по числу строк.
+        """
+        self.seed(groups=3)
+        User.objects.filter(username='seed3').delete()
+        Group.objects.filter(slug='seed-group-0').delete()
+        self.seed(groups=3)
+        self.assertEqual(User.objects.count(), 59)
+        self.assertTrue(User.objects.filter(username='seed59').exists())
+        self.assertTrue(Group.objects.filter(slug='seed-group-5').exists())
+
+    def test_seed_is_deterministic(self):
+        """Один и тот же --seed дает одинаковые данные."""
+        self.seed(seed=7)
+        first = self.snapshot()
+        self.clear()
+        self.seed(seed=7)
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        self.seed(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_distribution_options(self):
+        """Доли постов в группах и с картинками задаются параметрами."""
+        self.seed(group_share=0, image_share=0)
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+        self.assertFalse(Post.objects.exclude(image='').exists())
+        self.clear()
+        self.seed(group_share=1, image_share=1)
+        self.assertFalse(Post.objects.filter(group__isnull=True).exists())
+        self.assertFalse(Post.objects.filter(image='').exists())
+
+    def test_author_skew(self):
+        """При сильной асимметрии у самого плодовитого автора больше
+        постов, чем при равномерном распределении.
+        """
+        self.seed(author_skew=0)
+        uniform = max(User.objects.values_list(
+            'stats__posts_count', flat=True))
+        self.clear()
+        self.seed(author_skew=2)
+        skewed = max(User.objects.values_list(
+            'stats__posts_count', flat=True))
+        self.assertGreater(skewed, uniform * 3)
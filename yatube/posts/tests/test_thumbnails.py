@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..thumbnails import variant_names
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumbnails')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def media_files(self):
+        return {os.path.join(root, name)
+                for root, _, names in os.walk(TEMP_MEDIA_ROOT)
+                for name in names}
+
+    def image_files(self, post):
+        """Пути к миниатюре и вариантам картинки поста."""
+        names = [post.thumbnail_url[len(settings.MEDIA_URL):]]
+        names.extend(variant_names(post.image_variants))
+        return [os.path.join(TEMP_MEDIA_ROOT, name) for name in names]
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif')
+
+    def test_thumbnail_created_on_upload(self):
+        """Миниатюра создается при загрузке и выводится в ленте."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': self.upload('a.gif')}
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.thumbnail_url)
+        path = os.path.join(
+            TEMP_MEDIA_ROOT,
+            post.thumbnail_url[len(settings.MEDIA_URL):]
+        )
+        self.assertTrue(os.path.exists(path))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail_url)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_placeholder_shown_until_task_runs(self):
+        """Пока задача не выполнена, лента выводит заглушку вместо
+        оригинала и не создает миниатюру при рендеринге.
+        """
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост в очереди', 'image': self.upload('q.gif')}
+        )
+        post = Post.objects.get(text='Пост в очереди')
+        self.assertFalse(post.thumbnail_url)
+        files = self.media_files()
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'thumbnail-placeholder.svg')
+        self.assertNotContains(response, 'src="%s"' % post.image.url)
+        self.assertEqual(self.media_files(), files)
+
+    def test_thumbnail_regenerated_on_image_change(self):
+        """Новая картинка при редактировании получает новую миниатюру."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост', 'image': self.upload('b.gif')}
+        )
+        post = Post.objects.get(text='Пост')
+        old_url = post.thumbnail_url
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': self.upload('c.gif')}
+        )
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        self.assertNotEqual(post.thumbnail_url, old_url)
+
+    def test_old_image_files_deleted(self):
+        """Миниатюра и варианты удаляются при замене картинки и удалении
+        поста; оригиналы остаются.
+        """
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с заменой', 'image': self.upload('e.gif')}
+        )
+        post = Post.objects.get(text='Пост с заменой')
+        old_files = self.image_files(post)
+        self.assertTrue(all(map(os.path.exists, old_files)))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост с заменой', 'image': self.upload('f.gif')}
+        )
+        self.assertFalse(any(map(os.path.exists, old_files)))
+        self.assertTrue(os.path.exists(post.image.path))
+        post.refresh_from_db()
+        new_files = self.image_files(post)
+        self.assertTrue(all(map(os.path.exists, new_files)))
+        post.delete()
+        self.assertFalse(any(map(os.path.exists, new_files)))
+
+    def test_image_variants_rendered_as_srcset(self):
+        """Варианты WebP разных ширин попадают в srcset ленты."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с вариантами', 'image': self.upload('d.gif')}
+        )
+        post = Post.objects.get(text='Пост с вариантами')
+        sources = dict(post.image_sources())
+        self.assertIn('image/webp', sources)
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            with self.subTest(width=width):
+                url = '%s-%s.webp' % (
+                    settings.MEDIA_URL + json.loads(post.image_variants)['b'],
+                    width
+                )
+                self.assertIn('%s %sw' % (url, width), sources['image/webp'])
+                path = os.path.join(
+                    TEMP_MEDIA_ROOT, url[len(settings.MEDIA_URL):])
+                self.assertTrue(os.path.exists(path))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, sources['image/webp'])
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry
+from ..paginators import CursorPage
+from ..timeline import follow_feed, follow_page, rebuild_timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+
+    def test_follow_and_unfollow_rebuild_timeline(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+        posts = [
+            Post.objects.create(text='Пост' + str(index), author=self.author)
+            for index in range(3)
+        ]
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(follow_feed(self.reader)), posts[::-1])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(list(follow_feed(self.reader)), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_on_the_fly(self):
+        """Посты автора с множеством подписчиков читаются без fan-out."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(text='Популярный пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_crossing_fanout_limit_keeps_posts(self):
+        """Посты не пропадают из лент, когда автор становится «звездой»
+        и перестает ею быть.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        early = Post.objects.create(text='До', author=self.author)
+        follow = Follow.objects.create(user=self.other, author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.author).exists())
+        popular = Post.objects.create(text='Во время', author=self.author)
+        self.assertEqual(list(follow_feed(self.reader)), [popular, early])
+        follow.delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post_id', flat=True)),
+            {early.pk, popular.pk})
+        self.assertEqual(list(follow_feed(self.reader)), [popular, early])
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.other).exists())
+
+    def test_rebuild_timeline(self):
+        """Пересборка восстанавливает ленту по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        TimelineEntry.objects.all().delete()
+        rebuild_timeline(self.reader.pk)
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+
+    def test_follow_page_cursor_survives_pull_mode(self):
+        """Лента подписок листается курсором; курсор страницы из
+        материализованной ленты годится и для чтения на лету.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(text='Пост %s' % index,
+                                     author=self.author)
+                 for index in range(15)]
+        first = follow_page(RequestFactory().get('/'), self.reader)
+        self.assertIsInstance(first, CursorPage)
+        self.assertEqual(list(first), posts[:4:-1])
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            second = follow_page(
+                RequestFactory().get('/', {'cursor': first.next_cursor}),
+                self.reader)
+        self.assertEqual(list(second), posts[4::-1])
+        self.assertFalse(second.has_next())
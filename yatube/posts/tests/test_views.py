@@ -70,6 +70,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -232,13 +233,29 @@ class PostPagesTests(TestCase):
 
     def test_index_page_cashed(self):
         """Тестирования кеширования главной страницы."""
-        response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
-        response_one_more = self.authorized_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response_one_more = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_one_more.content)
-        cache.clear()
-        response_cleared = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content, response_cleared.content)
+        Post.objects.all().delete()
+        response_deleted = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_deleted.content)
+
+    def test_feed_cache_invalidated_by_new_post(self):
+        """Новый пост сразу появляется в закешированных лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Свежий пост')
 
     def test_profile_follow(self):
         """Тестирование добавления подписки."""
@@ -0,0 +1,114 @@
+import hashlib
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete, get_thumbnail
+
+from core.tasks import task
+
+from . import feed_cache
+from .models import Post
+
+# Геометрия миниатюры, которую выводят шаблоны постов.
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_SIZE = (960, 339)
+VARIANTS_DIR = 'cache/variants'
+
+
+def supported_formats():
+    """Современные форматы из настроек, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        fmt for fmt in settings.IMAGE_VARIANT_FORMATS if fmt in Image.SAVE
+    ]
+
+
+def generate_variants(image_field):
+    """Создает варианты картинки разной ширины в форматах WebP/AVIF.
+
+    Возвращает компактный манифест: общий префикс имен, ширины и форматы.
+    """
+    formats = supported_formats()
+    if not formats:
+        return ''
+    width, height = THUMBNAIL_SIZE
+    digest = hashlib.md5(image_field.name.encode()).hexdigest()
+    base = '%s/%s/%s/%s' % (VARIANTS_DIR, digest[:2], digest[2:4], digest)
+    with image_field.open('rb') as source:
+        original = Image.open(source)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    widths = sorted(set(settings.IMAGE_VARIANT_WIDTHS))
+    for variant_width in widths:
+        size = (variant_width, round(variant_width * height / width))
+        variant = ImageOps.fit(original, size, Image.LANCZOS)
+        for fmt in formats:
+            buffer = BytesIO()
+            variant.save(buffer, fmt, quality=settings.IMAGE_VARIANT_QUALITY)
+            name = '%s-%s.%s' % (base, variant_width, fmt.lower())
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return json.dumps(
+        {'b': base, 'w': widths, 'f': [fmt.lower() for fmt in formats]},
+        separators=(',', ':')
+    )
+
+
+def variant_names(manifest):
+    """Имена файлов вариантов по манифесту generate_variants."""
+    try:
+        manifest = json.loads(manifest)
+    except ValueError:
+        return []
+    return ['%s-%s.%s' % (manifest['b'], width, fmt)
+            for width in manifest['w'] for fmt in manifest['f']]
+
+
+@task
+def delete_image_files(image_name, manifest):
+    """Удаляет миниатюру sorl и варианты замененной или удаленной
+    картинки. Сама картинка остается в хранилище.
+    """
+    delete(image_name, delete_file=False)
+    for name in variant_names(manifest):
+        default_storage.delete(name)
+
+
+@task
+def generate_thumbnail(post_id):
+    """Создает миниатюру и варианты картинки, сохраняет их адреса в посте."""
+    post = Post.objects.filter(pk=post_id).select_related(
+        'author', 'group').only(
+        'image', 'author__username', 'group__slug').first()
+    if post is None or not post.image:
+        return None
+    thumbnail = get_thumbnail(
+        post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+    variants = generate_variants(post.image)
+    if not Post.objects.filter(pk=post_id, image=post.image.name).update(
+            thumbnail_url=thumbnail.url, image_variants=variants):
+        # Картинку заменили или пост удалили, пока шла задача.
+        delete_image_files(post.image.name, variants)
+        return None
+    feed_cache.bump_post_feeds(
+        post.author.username, post.group and post.group.slug,
+        post_id=post.pk)
+    return thumbnail.url
+
+
+def schedule_thumbnail(post):
+    """Ставит создание миниатюры в очередь задач (core.tasks).
+
+    Вызывается после сохранения поста. Без ATOMIC_REQUESTS пост к этому
+    моменту уже зафиксирован; внутри транзакции задача фиксируется
+    вместе с ним. В обоих случаях воркер не возьмет задачу раньше, чем
+    увидит пост. При TASKS_EAGER миниатюра создается сразу.
+    """
+    generate_thumbnail.delay(post.pk)
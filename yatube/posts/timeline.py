@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import FEED_FIELDS, feed_queryset, paginate
+
+BATCH_SIZE = 500
+
+
+def fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def is_fanout_author(author_id):
+    """Посты автора раскладываются по лентам, если подписчиков немного."""
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return (followers or 0) <= fanout_limit()
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post.pk,
+                       pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def add_author(user_id, author_id):
+    """Переносит посты автора в ленту нового подписчика."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def followers_changed(author_id, delta):
+    """Переводит автора между fan-out и чтением на лету.
+
+    Вызывается после изменения счетчика подписчиков на delta. Когда
+    автор становится «звездой», его записи убираются из лент: посты
+    читаются на лету. Когда подписчиков снова не больше предела,
+    ленты всех подписчиков заполняются его постами, иначе посты
+    «звездного» периода пропали бы из лент.
+    """
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+    limit = fanout_limit()
+    if followers - delta <= limit < followers:
+        TimelineEntry.objects.filter(post__author_id=author_id).delete()
+    elif followers <= limit < followers - delta:
+        backfill_author(author_id)
+
+
+def backfill_author(author_id):
+    """Заново раскладывает все посты автора по лентам подписчиков."""
+    TimelineEntry.objects.filter(post__author_id=author_id).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO %s (user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date FROM %s f '
+            'JOIN %s p ON p.author_id = f.author_id '
+            'WHERE f.author_id = %%s' % (
+                TimelineEntry._meta.db_table, Follow._meta.db_table,
+                Post._meta.db_table),
+            [author_id])
+
+
+def rebuild_timeline(user_id):
+    """Полностью пересобирает ленту пользователя по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)
+    for author_id in authors:
+        add_author(user_id, author_id)
+
+
+def rebuild_all():
+    """Пересобирает все ленты одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки данных, минующей сигналы; опирается
+    на пересчитанные счетчики подписчиков.
+    """
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO %s (user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date FROM %s f '
+            'JOIN %s s ON s.user_id = f.author_id '
+            'JOIN %s p ON p.author_id = f.author_id '
+            'WHERE s.followers_count <= %%s' % (
+                TimelineEntry._meta.db_table, Follow._meta.db_table,
+                UserStats._meta.db_table, Post._meta.db_table),
+            [fanout_limit()])
+
+
+def pull_authors(user):
+    """Авторы с огромным числом подписчиков: их посты читаются на лету."""
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__followers_count__gt=fanout_limit())
+        .values_list('author_id', flat=True)
+    )
+
+
+def follow_feed(user):
+    """Лента подписок: материализованные записи плюс посты «звезд»."""
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user=user).values('post_id'))
+    pulled = pull_authors(user)
+    if pulled:
+        condition |= Q(author_id__in=pulled)
+    return Post.objects.filter(condition)
+
+
+def follow_entries(user):
+    """Записи ленты с постами в порядке индекса (user, -pub_date, -post)."""
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post', 'post__author', 'post__group'
+    ).only('pub_date', 'post', *('post__' + field for field in FEED_FIELDS))
+
+
+def follow_page(request, user):
+    """Страница ленты подписок.
+
+    Без «звезд» среди подписок страница читается прямо из индекса
+    материализованной ленты, без сортировки постов. Курсор в обоих
+    случаях хранит (pub_date, id поста), поэтому переживает переход
+    автора между fan-out и чтением на лету.
+    """
+    if pull_authors(user):
+        return paginate(request, feed_queryset(follow_feed(user)))
+    page = paginate(request, follow_entries(user))
+    page.object_list = [entry.post for entry in page.object_list]
+    return page
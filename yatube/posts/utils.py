@@ -0,0 +1,57 @@
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.http.request import HttpRequest
+
+from .models import Comment, Post
+from .paginators import CursorPaginator
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+# Поля, которые выводят шаблоны лент.
+FEED_FIELDS = (
+    'text', 'pub_date', 'image', 'thumbnail_url', 'image_variants',
+    'comments_count', 'author', 'group',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title', 'group__slug',
+)
+
+
+def feed_queryset(queryset=None, with_comments=False):
+    """Посты для ленты: автор и группа одним запросом, только нужные поля.
+
+    С with_comments посты аннотируются точным числом комментариев
+    comments_total.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    queryset = queryset.select_related('author', 'group').only(*FEED_FIELDS)
+    if with_comments:
+        queryset = queryset.annotate(comments_total=Count('comments'))
+    return queryset
+
+
+def paginate(request: HttpRequest, queryset, per_page=POSTS_PER_PAGE):
+    """Возвращает страницу ленты.
+
+    Страницы ленты листаются курсором (параметр cursor): страница
+    строится по ключу сортировки без COUNT(*) и OFFSET. Параметр page
+    оставлен для совместимости со старыми ссылками и строит страницу
+    по номеру.
+    """
+    if 'cursor' in request.GET or 'page' not in request.GET:
+        paginator = CursorPaginator(queryset, per_page)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(queryset, per_page)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def comments_page(post_id, cursor=None, per_page=COMMENTS_PER_PAGE):
+    """Страница комментариев поста по курсору в порядке Comment.Meta.
+
+    Стоимость страницы не зависит от числа комментариев: один запрос
+    по индексу (post, -created, -id) без COUNT(*) и OFFSET. Битый курсор
+    вызывает InvalidCursor.
+    """
+    queryset = Comment.objects.filter(post_id=post_id).select_related('author')
+    return CursorPaginator(queryset, per_page).page(cursor)
@@ -1,62 +1,72 @@
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, HttpResponseBadRequest
 from django.http.request import HttpRequest
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from .models import Post, Group, Comment, Follow
-from .forms import PostForm, CommentForm
-
-POSTS_PER_PAGE = 10
-
 
+from core.concurrency import gather
+from core.db_router import read_replica
+from core.ratelimit import rate_limit, shed_load
+from .models import Post, Group, Follow
+from .paginators import InvalidCursor
+from .forms import PostForm, CommentForm
+from .conditional import (
+    conditional_page, get_author, get_group, get_post, group_scopes,
+    index_scopes, post_scopes, profile_scopes
+)
+from .counters import get_user_stats
+from .feed_cache import (
+    INDEX_SCOPE, cached_feed, group_scope, profile_scope
+)
+from .search import search_posts
+from .thumbnails import schedule_thumbnail
+from .timeline import follow_page
+from .utils import POSTS_PER_PAGE, comments_page, feed_queryset
+
+
+@read_replica
+@conditional_page(index_scopes)
 def index(request: HttpRequest) -> HttpResponse:
     """Получение списка постов из базы данных."""
-    post_list = Post.objects.all().select_related('author')
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'page_obj': page_obj
-    }
+    post_list = feed_queryset()
+    context = cached_feed(request, post_list, INDEX_SCOPE)
     return render(request, 'posts/index.html', context)
 
 
+@read_replica
+@conditional_page(group_scopes)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Получение списка постов из базы данных для указанной группы."""
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all().select_related('author')
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_group(request, slug)
+    post_list = feed_queryset(group.posts.all())
     context = {
         'group': group,
-        'page_obj': page_obj
+        **cached_feed(request, post_list, group_scope(slug))
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@read_replica
+@conditional_page(profile_scopes)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
-    """Получение списка постов из базы данных для указанного пользователя."""
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author__username=username)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+    """Получение списка постов из базы данных для указанного пользователя.
+
+    Кнопка подписки зависит от читателя и рендерится отдельно
+    (posts/includes/follow_button.html), поэтому страница кешируется
+    целиком.
+    """
+    author = get_author(request, username)
+    posts = feed_queryset(Post.objects.filter(author=author))
     context = {
         'author': author,
-        'page_obj': page_obj,
-        'posts_number': paginator.count,
-        'following': following
+        'posts_number': get_user_stats(author).posts_count,
+        **cached_feed(request, posts, profile_scope(username))
     }
     return render(request, 'posts/profile.html', context)
 
 
 @login_required
+@rate_limit('post')
 def post_create(request: HttpRequest) -> HttpResponse:
     """Создание нового поста."""
     is_edit = False
@@ -69,6 +79,8 @@ def post_create(request: HttpRequest) -> HttpResponse:
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            schedule_thumbnail(post)
         return redirect('posts:profile', username=post.author.username)
 
     context = {
@@ -92,7 +104,13 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
         instance=post
     )
     if request.method == 'POST' and form.is_valid():
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.thumbnail_url = ''
+            post.image_variants = ''
         post.save()
+        if image_changed and post.image:
+            schedule_thumbnail(post)
         return redirect('posts:post_detail', post_id=post.pk)
 
     context = {
@@ -104,13 +122,15 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     return render(request, 'posts/create_post.html', context)
 
 
+@read_replica
+@conditional_page(post_scopes)
 def post_detail(request, post_id):
     """Получение выбранного поста из базы данных."""
-    post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=post_id)
-    username = post.author.username
-    posts_number = Post.objects.filter(author__username=username).count()
-    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    post, comments = gather(
+        lambda: get_post(request, post_id),
+        lambda: comments_page(post_id),
+    )
+    posts_number = get_user_stats(post.author).posts_count
     form = CommentForm(request.POST or None)
     context = {
         'posts_number': posts_number,
@@ -121,7 +141,28 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@shed_load
+@read_replica
+@conditional_page(post_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев поста фрагментом HTML.
+
+    Битый курсор — ошибка клиента: первая страница вместо следующей
+    задвоила бы комментарии в ленте.
+    """
+    try:
+        comments = comments_page(post_id, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Неверный курсор')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@rate_limit('comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -134,12 +175,10 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_replica
 def follow_index(request):
     """Получение списка выбранных постов из базы данных."""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = follow_page(request, request.user)
     context = {
         'page_obj': page_obj
     }
@@ -147,6 +186,7 @@ def follow_index(request):
 
 
 @login_required
+@rate_limit('follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = User.objects.get(username=username)
     if request.user != author:
@@ -159,3 +199,16 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@shed_load
+def search(request: HttpRequest) -> HttpResponse:
+    """Поиск постов по тексту постов и комментариев."""
+    query = request.GET.get('q', '').strip()
+    page_obj = search_posts(
+        query, request.GET.get('cursor'), POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,93 @@
+import logging
+import threading
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import reverse
+
+from .models import Group, Post
+from .paginators import CursorPaginator
+from .utils import POSTS_PER_PAGE
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LOCK_KEY = 'feed-warmup-lock'
+WARMUP_LOCK_TIMEOUT = 60
+# Хост запросов прогрева; должен быть в ALLOWED_HOSTS.
+WARMUP_HOST = 'localhost'
+
+
+def _get(handler, path, cursor):
+    """GET гостя через обработчик WSGI со всеми middleware."""
+    environ = {
+        'PATH_INFO': path,
+        # Первая страница — без параметра, как по ссылкам сайта.
+        'QUERY_STRING': urlencode({'cursor': cursor}) if cursor else '',
+        'HTTP_HOST': WARMUP_HOST,
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    response = handler(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    if not statuses[0].startswith('200'):
+        logger.warning('Прогрев %s?%s: %s',
+                       path, environ['QUERY_STRING'], statuses[0])
+
+
+def warm_up(pages=None, groups=None):
+    """Запрашивает первые страницы главной и самых активных групп.
+
+    Запросы гостя проходят через обработчик WSGI со всеми middleware,
+    поэтому в кеш попадают те же страницы, что и у настоящих
+    посетителей. Возвращает число прогретых страниц.
+    """
+    pages = pages or settings.CACHE_WARMUP_PAGES
+    groups = groups or settings.CACHE_WARMUP_GROUPS
+    handler = WSGIHandler()
+    feeds = [(reverse('posts:index'), Post.objects.all())]
+    active_groups = Group.objects.filter(
+        posts_count__gt=0).order_by('-posts_count')[:groups]
+    feeds.extend(
+        (reverse('posts:group_list', kwargs={'slug': group.slug}),
+         Post.objects.filter(group=group))
+        for group in active_groups
+    )
+    rendered = 0
+    for path, queryset in feeds:
+        # Следующие страницы — по тем же курсорам, что в ссылках ленты.
+        paginator = CursorPaginator(queryset, POSTS_PER_PAGE)
+        cursor = ''
+        for _ in range(pages):
+            _get(handler, path, cursor)
+            rendered += 1
+            cursor = paginator.page(cursor).next_cursor
+            if not cursor:
+                break
+    return rendered
+
+
+def warm_up_in_background():
+    """Прогревает кеш в фоне; в общем кеше это делает один воркер."""
+    if not cache.add(WARMUP_LOCK_KEY, True, WARMUP_LOCK_TIMEOUT):
+        return None
+
+    def run():
+        try:
+            logger.info('Прогрето страниц: %s', warm_up())
+        except Exception:
+            logger.exception('Не удалось прогреть кеш лент')
+
+    thread = threading.Thread(target=run, name='feed-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,24 @@
+// Подгружает следующие комментарии поста фрагментом вместо перехода.
+// При ошибке (перегрузка, битый курсор, сеть) ссылка открывается как
+// обычно, чтобы страница ошибки не попала в список комментариев.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-more-comments]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.href, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('afterend', html);
+      link.remove();
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
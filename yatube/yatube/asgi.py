@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from .wsgi import application as wsgi_application  # noqa: E402
+
+# Тело запроса больше этого размера читается во временный файл.
+BODY_MEMORY_LIMIT = 1024 * 1024
+
+
+def build_environ(scope, body):
+    """Окружение WSGI (PEP 3333) для запроса ASGI с телом body."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port or 80),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        if name in environ:
+            # Повторы заголовка склеиваются, как это делает сервер WSGI.
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = environ[name] + separator + value
+        environ[name] = value
+    return environ
+
+
+class ThreadedWsgiToAsgi:
+    """ASGI-приложение поверх обработчика WSGI.
+
+    В Django 2.2 нет асинхронных представлений, поэтому каждый запрос
+    выполняется в пуле потоков цикла событий, а чтение тела запроса
+    и отправка ответа медленным клиентам не занимают поток. Из asgiref
+    используются только sync_to_async и async_to_sync.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError('Поддерживаются только запросы http, а не %s'
+                             % scope['type'])
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            await sync_to_async(self.serve, thread_sensitive=False)(
+                scope, body, send)
+        finally:
+            body.close()
+
+    def serve(self, scope, body, send):
+        """Выполняет приложение WSGI и отправляет ответ по частям."""
+        send = async_to_sync(send)
+        response_start = None
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            nonlocal response_start
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response_start = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'),
+                             value.encode('latin1'))
+                            for name, value in headers],
+            }
+
+        def send_body(chunk, more_body):
+            nonlocal started
+            if not started:
+                started = True
+                send(response_start)
+            send({'type': 'http.response.body', 'body': chunk,
+                  'more_body': more_body})
+
+        response = self.wsgi_application(
+            build_environ(scope, body), start_response)
+        try:
+            for chunk in response:
+                send_body(chunk, True)
+        finally:
+            # close() посылает request_finished: Django закрывает
+            # соединения с базой.
+            if hasattr(response, 'close'):
+                response.close()
+        send_body(b'', False)
+
+
+application = ThreadedWsgiToAsgi(wsgi_application)
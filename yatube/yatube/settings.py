@@ -1,5 +1,7 @@
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
@@ -35,30 +37,67 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar подключается только для отладки: без DEBUG он бесполезен,
+# а его middleware замедляет каждый запрос. В продакшене запросы считает
+# core.middleware.RequestStatsMiddleware.
+DEBUG_TOOLBAR = DEBUG and os.getenv('DEBUG_TOOLBAR', '1') == '1'
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
+# Сессии: cached_db читает сессию из кеша и пишет в базу только при
+# изменении, signed_cookies хранит ее в подписанной cookie без базы.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.getenv(
+    'SESSION_BACKEND', 'cached_db')
+
+# Пользователь сессии берется из кеша (core.auth) и сбрасывается при
+# сохранении пользователя и смене пароля. ModelBackend остается после
+# него, чтобы сессии, созданные до core.auth, не разлогинивались; такие
+# сессии читают пользователя из базы на каждый запрос до нового входа.
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 60 * 5
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Без DEBUG шаблоны разбираются один раз на процесс (cached loader)
+# и компилируются при старте воркера (core.template_cache); при отладке
+# правки шаблонов подхватываются без перезапуска.
+TEMPLATE_CACHE = os.getenv('TEMPLATE_CACHE', '0' if DEBUG else '1') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -76,19 +115,90 @@ LOGIN_REDIRECT_URL = 'posts:index'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма отправляются задачами очереди через QUEUED_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# База данных выбирается переменными окружения. DB_ENGINE=sqlite (по
+# умолчанию) — файл DB_NAME; DB_ENGINE=postgresql — сервер DB_HOST с
+# постоянными соединениями (нужен пакет psycopg2).
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Соединение живет между запросами и проверяется перед
+            # каждым (core.database.check_connections).
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': os.getenv('DB_HEALTH_CHECKS', '1') == '1',
+        }
+    }
+    # Реплики только для чтения: хосты через запятую, с теми же
+    # учетными данными.
+    for index, host in enumerate(
+            filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+        DATABASES['replica%s' % index] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            # Постоянное соединение не повторяет PRAGMA на каждый запрос.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        }
     }
+    # Реплики только для чтения: пути к файлам SQLite через запятую
+    # (копии основной базы, например для локальной проверки
+    # маршрутизации).
+    for index, path in enumerate(
+            filter(None, os.getenv('DATABASE_REPLICA_FILES', '').split(','))):
+        DATABASES['replica%s' % index] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Применяются к каждому соединению SQLite (core.database): WAL дает
+# читать во время записи, busy_timeout (мс) — ждать блокировку вместо
+# ошибки «database is locked».
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'busy_timeout': int(os.getenv('DB_SQLITE_BUSY_TIMEOUT', '5000')),
 }
 
+# Независимые запросы представления (профиль, страница поста) идут
+# параллельно в пуле потоков (core.concurrency.gather). У каждого потока
+# пула свое постоянное соединение. Для SQLite запросы короче накладных
+# расходов на передачу в поток, поэтому по умолчанию только PostgreSQL.
+CONCURRENT_QUERIES = os.getenv(
+    'CONCURRENT_QUERIES', '1' if DB_ENGINE == 'postgresql' else '0') == '1'
+CONCURRENT_QUERIES_WORKERS = int(os.getenv('CONCURRENT_QUERIES_WORKERS', '8'))
+
+# Ленты и страницы постов (@read_replica) читаются с реплик, запись
+# всегда идет в основную базу. После записи сессия пользователя
+# DATABASE_REPLICA_PIN_SECONDS читает с основной базы, чтобы автор видел
+# свои изменения; окно должно перекрывать отставание реплик.
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_REPLICA_PIN_SECONDS = 15
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -122,8 +232,108 @@ STATIC_URL = '/static/'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Бэкенд кеша выбирается переменными окружения CACHE_BACKEND и
+# CACHE_LOCATION. Общий для всех воркеров кеш дают redis (нужен пакет
+# django-redis), memcached (нужен python-memcached), file и db
+# (таблица создается командой createcachetable).
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+    'memcached': (
+        'django.core.cache.backends.memcached.MemcachedCache',
+        '127.0.0.1:11211',
+    ),
+    'redis': ('django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+
+_cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
+if _cache_backend not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        'Неизвестный CACHE_BACKEND %r, допустимые значения: %s.'
+        % (_cache_backend, ', '.join(CACHE_BACKENDS)))
+CACHE_BACKEND, CACHE_DEFAULT_LOCATION = CACHE_BACKENDS[_cache_backend]
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_DEFAULT_LOCATION),
+        'KEY_PREFIX': 'yatube',
     }
 }
+
+# Прогрев первых страниц лент при старте воркера (см. posts.warmup).
+CACHE_WARMUP_ON_STARTUP = os.getenv('CACHE_WARMUP_ON_STARTUP') == '1'
+CACHE_WARMUP_PAGES = 3
+CACHE_WARMUP_GROUPS = 10
+
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации: их посты подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Время жизни страниц лент в кеше. Записи инвалидируются сменой версии
+# при изменении постов и комментариев, поэтому могут жить долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Гостевые страницы лент и постов отдаются с Cache-Control: public
+# на столько секунд, чтобы их мог кешировать обратный прокси; вошедшим
+# пользователям — private, с перепроверкой по ETag.
+ANONYMOUS_CACHE_MAX_AGE = int(os.getenv('ANONYMOUS_CACHE_MAX_AGE', '60'))
+
+# Кеш страниц лент и постов (posts.conditional): гостям — готовая
+# страница, вошедшим — общий каркас с шапкой и кнопками, которые
+# рендерятся на каждый запрос.
+PAGE_CACHE = os.getenv('PAGE_CACHE', '1') == '1'
+
+# Очередь задач (core.tasks) в базе данных: миниатюры постов, письма.
+# Задачи выполняет manage.py runworker; с TASKS_EAGER (по умолчанию
+# в режиме отладки) — сразу, в том же запросе.
+TASKS_EAGER = os.getenv('TASKS_EAGER', '1' if DEBUG else '0') == '1'
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', '2'))
+TASK_POLL_INTERVAL = 1.0
+TASK_MAX_ATTEMPTS = 5
+# Пауза перед повтором удваивается с каждой попыткой: 10 с, 20 с, 40 с...
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+# Задача, которую воркер не завершил за это время, забирается снова.
+TASK_LEASE_SECONDS = 5 * 60
+
+# Варианты картинок для srcset: ширины и форматы (неподдерживаемые
+# установленным Pillow форматы пропускаются).
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP')
+IMAGE_VARIANT_QUALITY = 75
+
+# Поиск: 'auto' — SQLite FTS5, если доступен, иначе обратный индекс
+# в таблице SearchPosting; 'python' — всегда обратный индекс.
+SEARCH_BACKEND = 'auto'
+# Свежесть умножает релевантность: на 1 + SEARCH_RECENCY_BOOST у нового
+# поста, прибавка вдвое меньше через SEARCH_RECENCY_HALF_LIFE дней.
+SEARCH_RECENCY_BOOST = 0.5
+SEARCH_RECENCY_HALF_LIFE = 30
+
+# Статистика запросов (core.middleware.RequestStatsMiddleware): заголовок
+# Server-Timing и порог повторов одного запроса, после которого запрос
+# отмечается как N+1.
+REQUEST_STATS_SERVER_TIMING = True
+REQUEST_STATS_N_PLUS_ONE_THRESHOLD = 5
+
+# Ограничение частоты записей (core.ratelimit): действий за период для
+# каждого пользователя и каждого IP-адреса, корзины токенов в кеше.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT', '1') == '1'
+RATE_LIMITS = {
+    'post': os.getenv('RATE_LIMIT_POSTS', '5/m'),
+    'comment': os.getenv('RATE_LIMIT_COMMENTS', '10/m'),
+    'follow': os.getenv('RATE_LIMIT_FOLLOWS', '30/m'),
+}
+# Ключ request.META с адресом клиента. За обратным прокси —
+# 'HTTP_X_FORWARDED_FOR': берется последний адрес, дописанный прокси.
+RATE_LIMIT_IP_HEADER = os.getenv('RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+# Пока во всех процессах выполняется столько записей, второстепенные
+# чтения (поиск, подгрузка комментариев) получают 503.
+OVERLOAD_MAX_WRITES = int(os.getenv('OVERLOAD_MAX_WRITES', '8'))
+OVERLOAD_WINDOW = 60
+OVERLOAD_RETRY_AFTER = 5
@@ -3,12 +3,15 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import request_stats
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('stats/requests/', request_stats, name='request_stats'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -17,8 +20,9 @@ handler403 = 'core.views.permission_denied'
 
 
 if settings.DEBUG:
-    import debug_toolbar
-    urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
+    if settings.DEBUG_TOOLBAR:
+        import debug_toolbar
+        urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
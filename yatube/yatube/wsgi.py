@@ -5,3 +5,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.TEMPLATE_CACHE:
+    from core.template_cache import precompile_templates
+    precompile_templates()
+
+if settings.CACHE_WARMUP_ON_STARTUP:
+    from posts.warmup import warm_up_in_background
+    warm_up_in_background()